@@ -3,6 +3,8 @@ import sys
 import json
 
 from utils import read_problem
+from nearest import PointGrid
+from bonuses import globalist_budget, stretch
 
 
 problem_id = sys.argv[1]
@@ -15,17 +17,9 @@ def dist2(pt1, pt2):
     return (x1 - x2) ** 2 + (y1 - y2) ** 2
 
 
-def find_closest(pt, vertices):
-    min_dist = None
-    min_pt = None
-    min_index = None
-    for (index, to_pt) in enumerate(vertices):
-        d = dist2(pt, to_pt)
-        if min_dist is None or d < min_dist:
-            min_dist = d
-            min_pt = to_pt
-            min_index = index
-    return (min_dist, min_pt, min_index)
+def find_closest(pt, grid: PointGrid):
+    min_dist, min_index = grid.nearest(pt)
+    return (min_dist, list(grid.points[min_index]), min_index)
 
 
 def print_distances(problem_id):
@@ -37,9 +31,10 @@ def print_distances(problem_id):
             print (index, v)
 
     all_dist = []
+    grid = PointGrid(start['vertices'])
     for (hole_idx, hole_pt) in enumerate(spec['hole']):
         if hole_pt not in start['vertices']:
-            min_dist, min_pt, min_index = find_closest(hole_pt, start['vertices'])
+            min_dist, min_pt, min_index = find_closest(hole_pt, grid)
             all_dist.append((hole_idx, min_dist, min_pt, min_index))
 
     total = 0
@@ -67,7 +62,6 @@ def print_global_limit(problem_id):
     
     res = []
     total = 0
-    total_limit = 0
     for (a, b) in spec['figure']['edges']:
         a_pt =  spec['figure']['vertices'][a]
         b_pt = spec['figure']['vertices'][b]
@@ -76,10 +70,10 @@ def print_global_limit(problem_id):
         now_a_pt = start['vertices'][a]
         now_b_pt = start['vertices'][b]
         new_dist = dist2(now_a_pt, now_b_pt)
-        delta = abs(1.0 * new_dist / orig_dist - 1)
+        delta = stretch(orig_dist, new_dist)
         res.append((delta, a, b))
         total += delta
-        total_limit += spec["epsilon"] / 10**6
+    total_limit = globalist_budget(spec)
 
     print ('total = ', total)
     print ('total_limit = ', total_limit)
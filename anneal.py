@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# Simulated annealing on integer coordinates.
+#
+#   python anneal.py <problem_id> --anneal_time=60 [--anneal_from_golden=false]
+#
+# penalty = len_weight * sum over edges of the stretch beyond epsilon (in units
+#           of the original squared length)
+#         + out_weight * number of edges not inside the hole
+#         + dislikes
+# A move touches one vertex or a small group, so only the edges incident to it
+# are re-scored and dislikes come from the per-hole-vertex nearest distances
+# of a DislikesTracker.
+
+import math
+import os
+import random
+import time
+
+from absl import app
+from absl import flags
+
+from utils import read_problem, read_json
+from geometry import hole_raster
+from edge_cache import edge_cache
+from dislikes import DislikesTracker
+from nearest import hole_grid
+
+
+FLAGS = flags.FLAGS
+
+flags.DEFINE_float('anneal_time', 60, 'Seconds to anneal for.')
+flags.DEFINE_bool('anneal_from_golden', True, 'Start from solutions/golden/<id> if it exists.')
+flags.DEFINE_float('anneal_t0', 1000, 'Starting temperature.')
+flags.DEFINE_float('anneal_t1', 0.5, 'Final temperature.')
+flags.DEFINE_integer('anneal_seed', None, 'Random seed.')
+
+
+# move kinds and how often they are picked
+MOVES = (('shift', 0.55), ('group', 0.2), ('reflect', 0.2), ('snap', 0.05))
+
+
+class Annealer:
+    def __init__(self, spec, vertices, len_weight=100.0, out_weight=1000.0, rng=None):
+        self.spec = spec
+        self.rng = rng or random.Random()
+        self.len_weight = len_weight
+        self.out_weight = out_weight
+        self.epsilon = spec['epsilon'] / 1000000.0
+        self.raster = hole_raster(spec)
+        self.edge_cache = edge_cache(spec)
+        self.hole = [tuple(pt) for pt in spec['hole']]
+        self.hole_grid = hole_grid(spec)
+
+        orig = spec['figure']['vertices']
+        self.edges = [tuple(e) for e in spec['figure']['edges']]
+        self.orig_len = [(orig[a][0] - orig[b][0]) ** 2 + (orig[a][1] - orig[b][1]) ** 2 for a, b in self.edges]
+        self.incident = [[] for _ in orig]
+        self.adj = [[] for _ in orig]
+        for i, (a, b) in enumerate(self.edges):
+            self.incident[a].append(i)
+            self.incident[b].append(i)
+            self.adj[a].append(b)
+            self.adj[b].append(a)
+
+        self.pts = [(int(x), int(y)) for x, y in vertices]
+        self.dislikes = DislikesTracker(self.hole, self.pts)
+        self.cur_dislikes = self.dislikes.score()
+        self.edge_pen = [self._edge_penalty(i) for i in range(len(self.edges))]
+        self.edge_bad = [p > 0 for p in self.edge_pen]
+        self.constraint = sum(self.edge_pen)
+        self.num_bad = sum(self.edge_bad)
+
+        self.best = None
+        self.best_pts = None
+        self.moves = 0
+        self.accepted = 0
+        self._record_best()
+
+    def _edge_penalty(self, i):
+        a, b = self.edges[i]
+        A, B = self.pts[a], self.pts[b]
+        orig = self.orig_len[i]
+        d = (A[0] - B[0]) ** 2 + (A[1] - B[1]) ** 2
+        pen = 0.0
+        # same integer check as the validator
+        if abs(d - orig) * 1000000 > self.spec['epsilon'] * orig:
+            pen += self.len_weight * (abs(d - orig) - self.epsilon * orig)
+        if not self.edge_cache.is_edge_inside(A, B):
+            pen += self.out_weight
+        return pen
+
+    def penalty(self):
+        return self.constraint + self.cur_dislikes
+
+    def is_valid(self):
+        return self.num_bad == 0
+
+    def _record_best(self):
+        if self.num_bad == 0 and (self.best is None or self.cur_dislikes < self.best):
+            self.best = self.cur_dislikes
+            self.best_pts = list(self.pts)
+
+    def _propose(self, kind, radius):
+        # list of (vertex, new point), or None
+        rng = self.rng
+        n = len(self.pts)
+        v = rng.randrange(n)
+        x, y = self.pts[v]
+        if kind == 'shift' or kind == 'group':
+            dx = rng.randint(-radius, radius)
+            dy = rng.randint(-radius, radius)
+            if dx == 0 and dy == 0:
+                return None
+            group = [v] if kind == 'shift' else [v] + self.adj[v]
+            return [(u, (self.pts[u][0] + dx, self.pts[u][1] + dy)) for u in group]
+        if kind == 'reflect':
+            # mirror v over the line through two of its neighbours, which keeps
+            # both edge lengths (up to rounding)
+            if len(self.adj[v]) < 2:
+                return None
+            a, b = rng.sample(self.adj[v], 2)
+            (ax, ay), (bx, by) = self.pts[a], self.pts[b]
+            lx, ly = bx - ax, by - ay
+            l2 = lx * lx + ly * ly
+            if l2 == 0:
+                return None
+            t = ((x - ax) * lx + (y - ay) * ly) / l2
+            px, py = ax + t * lx, ay + t * ly
+            new = (int(round(2 * px - x)), int(round(2 * py - y)))
+            return None if new == (x, y) else [(v, new)]
+        # snap: pull v onto the hole vertex closest to it
+        h = self.hole_grid.nearest((x, y))
+        new = self.hole[h[1]]
+        return None if new == (x, y) else [(v, new)]
+
+    def _apply(self, moved):
+        for v, pt in moved:
+            self.dislikes.unplace(self.pts[v])
+            self.pts[v] = pt
+            self.dislikes.place(pt)
+
+    def step(self, temperature, radius):
+        self.moves += 1
+        rng = self.rng
+        r = rng.random()
+        for kind, p in MOVES:
+            r -= p
+            if r < 0:
+                break
+        moved = self._propose(kind, radius)
+        if not moved:
+            return False
+
+        if len(moved) == 1:
+            edges = self.incident[moved[0][0]]
+        else:
+            edges = set()
+            for v, _ in moved:
+                edges.update(self.incident[v])
+        old = [(v, self.pts[v]) for v, _ in moved]
+        # accepted iff delta <= threshold, i.e. with probability exp(-delta / T)
+        threshold = -temperature * math.log(1.0 - rng.random())
+
+        pts = self.pts
+        for v, pt in moved:
+            pts[v] = pt
+        new_pen = [self._edge_penalty(i) for i in edges]
+        delta = sum(new_pen) - sum(self.edge_pen[i] for i in edges)
+        # dislikes can't drop below the score with the new points added and the
+        # old ones kept, so most bad moves are turned down without touching the tracker
+        if delta + self.dislikes.score_if_added([pt for _, pt in moved]) - self.cur_dislikes > threshold:
+            for v, pt in old:
+                pts[v] = pt
+            return False
+
+        for v, pt in old:
+            pts[v] = pt
+        self._apply(moved)
+        new_dislikes = self.dislikes.score()
+        delta += new_dislikes - self.cur_dislikes
+
+        if delta <= threshold:
+            for i, pen in zip(edges, new_pen):
+                self.constraint += pen - self.edge_pen[i]
+                self.num_bad += (pen > 0) - self.edge_bad[i]
+                self.edge_pen[i] = pen
+                self.edge_bad[i] = pen > 0
+            self.cur_dislikes = new_dislikes
+            self.accepted += 1
+            self._record_best()
+            return True
+
+        self._apply(old)
+        return False
+
+    def run(self, seconds, t0=1000.0, t1=0.5, should_stop=None):
+        # geometric cooling from t0 to t1 over `seconds`; returns (best dislikes, vertices)
+        # of the best valid state, (None, None) if there was none
+        start = time.time()
+        end = start + seconds
+        span = max(1, max(self.raster.xmax - self.raster.xmin, self.raster.ymax - self.raster.ymin))
+        temperature = t0
+        while True:
+            now = time.time()
+            if now >= end or (should_stop is not None and should_stop()):
+                break
+            frac = (now - start) / seconds
+            temperature = t0 * (t1 / t0) ** frac
+            # large jumps while hot, unit steps when cold
+            radius = max(1, int(span * 0.1 * (1 - frac) ** 2))
+            for _ in range(1000):
+                self.step(temperature, radius)
+        return self.best, self.best_pts
+
+
+def initial_vertices(spec, problem_id=None, from_golden=True):
+    # golden solution if there is one, otherwise the figure moved to the middle of the hole;
+    # a golden using a bonus may not even have the figure's vertices, it is not a start
+    path = f'solutions/golden/{problem_id}'
+    if from_golden and problem_id is not None and os.path.exists(path):
+        golden = read_json(path)
+        if not golden.get('bonuses'):
+            return [tuple(pt) for pt in golden['vertices']]
+    raster = hole_raster(spec)
+    fig = spec['figure']['vertices']
+    fx = (min(p[0] for p in fig) + max(p[0] for p in fig)) // 2
+    fy = (min(p[1] for p in fig) + max(p[1] for p in fig)) // 2
+    hx = (raster.xmin + raster.xmax) // 2
+    hy = (raster.ymin + raster.ymax) // 2
+    return [(x - fx + hx, y - fy + hy) for x, y in fig]
+
+
+def anneal(spec, problem_id, seconds, from_golden=True, t0=1000.0, t1=0.5, seed=None, should_stop=None):
+    annealer = Annealer(spec, initial_vertices(spec, problem_id, from_golden), rng=random.Random(seed))
+    best, best_pts = annealer.run(seconds, t0, t1, should_stop)
+    return best, best_pts, annealer
+
+
+def main(argv):
+    problem_id = argv[1]
+    spec = read_problem(problem_id)
+    start = time.time()
+    best, best_pts, annealer = anneal(spec, problem_id, FLAGS.anneal_time, FLAGS.anneal_from_golden,
+                                      FLAGS.anneal_t0, FLAGS.anneal_t1, FLAGS.anneal_seed)
+    elapsed = time.time() - start
+    print(f'{annealer.moves} moves ({annealer.moves / elapsed * 60:.0f}/min), {annealer.accepted} accepted')
+    print(f'final penalty {annealer.penalty():.1f} ({annealer.num_bad} bad edges, {annealer.cur_dislikes} dislikes)')
+    if best is None:
+        print('No valid solution found')
+        return
+    print(f'best valid dislikes = {best}')
+    os.makedirs('solutions/anneal', exist_ok=True)
+    with open(f'solutions/anneal/{problem_id}', 'wt') as f:
+        f.write('{{"vertices":{}}}'.format([list(pt) for pt in best_pts]))
+
+
+if __name__ == '__main__':
+    app.run(main)
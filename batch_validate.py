@@ -0,0 +1,121 @@
+from collections import namedtuple
+
+import numpy as np
+
+from geometry import hole_raster
+from edge_cache import edge_cache
+
+
+# valid: (N,) bool, reasons: first failure per solution (None if valid),
+# dislikes: (N,) int64 (computed for every solution, valid or not)
+BatchResult = namedtuple('BatchResult', ['valid', 'reasons', 'dislikes'])
+
+# max number of elements in the temporary (solutions x edges x hole) arrays
+CHUNK_ELEMENTS = 1 << 22
+
+
+def _chunks(n, per_item):
+    step = max(1, CHUNK_ELEMENTS // max(1, per_item))
+    for start in range(0, n, step):
+        yield slice(start, min(n, start + step))
+
+
+def _cross(ax, ay, bx, by):
+    return ax * by - ay * bx
+
+
+def edges_inside_hole(spec, pts):
+    # (N, E) bool: figure edge e of solution n lies inside the hole.
+    # Segments that properly cross a hole edge are rejected and segments that
+    # never touch the boundary are accepted in bulk; only the ones touching
+    # the boundary (hole vertices, collinear runs) go through the exact check.
+    edges = np.asarray(spec['figure']['edges'], dtype=np.int64)
+    hole = np.asarray(spec['hole'], dtype=np.int64)
+    raster = hole_raster(spec)
+    cache = edge_cache(spec)
+
+    n, v = pts.shape[:2]
+    ends_inside = raster.contains_many(pts.reshape(-1, 2)).reshape(n, v)
+    inside = ends_inside[:, edges[:, 0]] & ends_inside[:, edges[:, 1]]
+
+    c = hole[:, None, :]
+    s = np.roll(hole, -1, axis=0)[:, None, :] - c
+    sx, sy = s[..., 0], s[..., 1]
+    for sl in _chunks(n, len(edges) * len(hole)):
+        a = pts[sl][:, edges[:, 0]].reshape(-1, 2)
+        b = pts[sl][:, edges[:, 1]].reshape(-1, 2)
+        rx, ry = (b - a)[:, 0], (b - a)[:, 1]
+        qx = c[..., 0] - a[:, 0]
+        qy = c[..., 1] - a[:, 1]
+        # shapes: hole edges x segments
+        den = _cross(rx, ry, sx, sy)
+        tn = _cross(qx, qy, sx, sy)
+        un = _cross(qx, qy, rx, ry)
+        sign = np.where(den < 0, -1, 1)
+        den, tn, un = den * sign, tn * sign, un * sign
+
+        crossing = (den != 0) & (tn > 0) & (tn < den) & (un > 0) & (un < den)
+        touching = (den != 0) & (tn >= 0) & (tn <= den) & (un >= 0) & (un <= den) & ~crossing
+        collinear = (den == 0) & (un == 0)
+        touching |= collinear
+
+        chunk_inside = inside[sl].reshape(-1) & ~crossing.any(axis=0)
+        for k in np.nonzero(chunk_inside & touching.any(axis=0))[0]:
+            chunk_inside[k] = cache.is_edge_inside(tuple(a[k]), tuple(b[k]))
+        inside[sl] = chunk_inside.reshape(inside[sl].shape)
+    return inside
+
+
+def batch_dislikes(spec, pts):
+    # (N,) sum over hole vertices of the squared distance to the closest vertex
+    hole = np.asarray(spec['hole'], dtype=np.int64)
+    n, v = pts.shape[:2]
+    res = np.empty(n, dtype=np.int64)
+    for sl in _chunks(n, len(hole) * v):
+        d = pts[sl][:, None, :, :] - hole[None, :, None, :]
+        res[sl] = (d ** 2).sum(axis=3).min(axis=2).sum(axis=1)
+    return res
+
+
+def validate_batch(spec, solutions):
+    # Validate N solutions of one problem at once, solutions is (N, V, 2)
+    arr = np.asarray(solutions, dtype=np.float64)
+    num_vertices = len(spec['figure']['vertices'])
+    if arr.ndim != 3 or arr.shape[1:] != (num_vertices, 2):
+        raise ValueError('expected solutions of shape (N, {}, 2), got {}'.format(num_vertices, arr.shape))
+    n = arr.shape[0]
+    pts = np.round(arr).astype(np.int64)
+
+    # integer coordinates
+    not_integral = (arr != pts).any(axis=2)
+    integral = ~not_integral.any(axis=1)
+
+    # edge lengths
+    edges = np.asarray(spec['figure']['edges'], dtype=np.int64)
+    orig = np.asarray(spec['figure']['vertices'], dtype=np.int64)
+    orig_dist = ((orig[edges[:, 0]] - orig[edges[:, 1]]) ** 2).sum(axis=1)
+    new_dist = ((pts[:, edges[:, 0]] - pts[:, edges[:, 1]]) ** 2).sum(axis=2)
+    len_ok = np.abs(new_dist - orig_dist) * 10**6 <= spec['epsilon'] * orig_dist
+    lengths = len_ok.all(axis=1)
+
+    # hole containment
+    inside = edges_inside_hole(spec, pts)
+    contained = inside.all(axis=1)
+
+    valid = integral & lengths & contained
+    reasons = [None] * n
+    for i in np.nonzero(~valid)[0]:
+        if not integral[i]:
+            x, y = arr[i, np.argmax(not_integral[i])]
+            reasons[i] = 'Coordinates ({}, {}) are not integers'.format(x, y)
+        elif not lengths[i]:
+            e = np.argmax(~len_ok[i])
+            reasons[i] = 'Edge ({}, {}) has wrong size: {} (orig={})'.format(
+                edges[e, 0], edges[e, 1], new_dist[i, e], orig_dist[e])
+        else:
+            e = np.argmax(~inside[i])
+            a, b = edges[e]
+            reasons[i] = 'Edge {}-{} ({} to {}) is not inside'.format(
+                a, b, pts[i, a].tolist(), pts[i, b].tolist())
+
+    return BatchResult(valid, reasons, batch_dislikes(spec, pts))
@@ -0,0 +1,192 @@
+import math
+import os
+
+from utils import read_problem
+
+
+GLOBALIST = 'GLOBALIST'
+SUPERFLEX = 'SUPERFLEX'
+WALLHACK = 'WALLHACK'
+BREAK_A_LEG = 'BREAK_A_LEG'
+BONUSES = (GLOBALIST, SUPERFLEX, WALLHACK, BREAK_A_LEG)
+# bonuses that loosen the rules for the figure as it is; BREAK_A_LEG changes
+# the figure instead, see break_leg()
+RELAXING = (GLOBALIST, SUPERFLEX, WALLHACK)
+
+# float slack taken off the GLOBALIST budget: the search sums the stretches in
+# another order than the checker does
+TOLERANCE = 1e-9
+
+
+def stretch(orig_dist, new_dist):
+    return abs(1.0 * new_dist / orig_dist - 1)
+
+
+def globalist_budget(spec):
+    # total stretch all edges together may have with GLOBALIST
+    return len(spec['figure']['edges']) * spec['epsilon'] / 10**6
+
+
+def break_leg(spec, edge):
+    # The problem with BREAK_A_LEG on `edge`: a new last vertex at the middle
+    # of the edge, joined to both of its ends instead of the edge itself.
+    a, b = edge
+    vertices = spec['figure']['vertices']
+    edges = [list(e) for e in spec['figure']['edges']]
+    if [a, b] in edges:
+        edges.remove([a, b])
+    elif [b, a] in edges:
+        edges.remove([b, a])
+    else:
+        raise ValueError(f'no edge {a}-{b} to break')
+    mid = len(vertices)
+    (ax, ay), (bx, by) = vertices[a], vertices[b]
+    x, y = (ax + bx) / 2, (ay + by) / 2
+    # keep integer coordinates integers, the lengths come out the same
+    middle = [int(x) if x == int(x) else x, int(y) if y == int(y) else y]
+    return {
+        'hole': spec['hole'],
+        'epsilon': spec['epsilon'],
+        'bonuses': spec.get('bonuses', []),
+        'figure': {'vertices': vertices + [middle], 'edges': edges + [[a, mid], [mid, b]]},
+    }
+
+
+def longest_edge(spec):
+    vertices = spec['figure']['vertices']
+    return max(spec['figure']['edges'], key=lambda e: (vertices[e[0]][0] - vertices[e[1]][0]) ** 2 +
+                                                      (vertices[e[0]][1] - vertices[e[1]][1]) ** 2)
+
+
+_OFFERS = {}
+
+def bonus_offers(root='.'):
+    # problem id -> [(bonus, problem it is unlocked on)] over every problem
+    if root not in _OFFERS:
+        offers = {}
+        for name in sorted(os.listdir(os.path.join(root, 'problems')), key=lambda s: (len(s), s)):
+            if not name.isdigit():
+                continue
+            for b in read_problem(name, root).get('bonuses', []):
+                offers.setdefault(b['problem'], []).append((b['bonus'], int(name)))
+        _OFFERS[root] = offers
+    return _OFFERS[root]
+
+
+def bonus_sources(problem_id, bonus, root='.'):
+    # problems where `bonus` for problem_id is unlocked
+    return [src for b, src in bonus_offers(root).get(int(problem_id), []) if b == bonus]
+
+
+def bonus_entry(problem_id, bonus, source=None, edge=None, spec=None, root='.'):
+    # the "bonuses" entry of a solution of problem_id using `bonus`
+    sources = bonus_sources(problem_id, bonus, root)
+    if source is None:
+        if not sources:
+            raise ValueError(f'no problem unlocks {bonus} for problem {problem_id}')
+        source = sources[0]
+    elif int(source) not in sources:
+        raise ValueError(f'problem {source} does not unlock {bonus} for problem {problem_id}')
+    entry = {'bonus': bonus, 'problem': int(source)}
+    if bonus == BREAK_A_LEG:
+        entry['edge'] = list(edge) if edge is not None else list(longest_edge(spec))
+    return entry
+
+
+def solution_bonus(solution):
+    # the bonus entry a solution uses, None for none; a solution gets one at most
+    bonuses = solution.get('bonuses') or []
+    if len(bonuses) > 1:
+        raise ValueError(f'{len(bonuses)} bonuses used, only one is allowed')
+    if bonuses and bonuses[0].get('bonus') not in BONUSES:
+        raise ValueError(f'unknown bonus {bonuses[0].get("bonus")}')
+    return bonuses[0] if bonuses else None
+
+
+class BonusBudget:
+    # What the bonus of a solution still allows, kept up to date vertex by
+    # vertex: the stretch left of the GLOBALIST budget, the one edge SUPERFLEX
+    # lets have any length, the one vertex WALLHACK lets out of the hole (its
+    # edges may leave the hole too). Without a bonus (or with BREAK_A_LEG)
+    # every edge has to fit epsilon and every vertex has to be inside.
+    # charge() works out what placing a vertex takes from its edges to the
+    # vertices placed before, take() and restore() move the state forward and
+    # back, so the search never rechecks the whole solution.
+    def __init__(self, spec, bonus=None):
+        self.bonus = bonus
+        self.epsilon = spec['epsilon']
+        self.budget = globalist_budget(spec) if bonus == GLOBALIST else 0.0
+        self.used = 0.0
+        self.flex_edge = None
+        self.outside = None
+
+    def fits(self, orig_dist, new_dist):
+        return abs(new_dist - orig_dist) * 10**6 <= self.epsilon * orig_dist
+
+    def remaining(self):
+        return self.budget - self.used
+
+    def flex_free(self):
+        return self.bonus == SUPERFLEX and self.flex_edge is None
+
+    def outside_free(self):
+        return self.bonus == WALLHACK and self.outside is None
+
+    def reach_epsilon(self, epsilon):
+        # stretch no single edge can go past, for the reach bounds of
+        # graph_dist and dislikes; None if there is no such bound (SUPERFLEX)
+        if self.bonus == GLOBALIST:
+            return max(self.budget, epsilon)
+        if self.bonus == SUPERFLEX:
+            return None
+        return epsilon
+
+    def ring_epsilon(self, epsilon):
+        # stretch of the rings to take candidates from: the GLOBALIST budget
+        # left, rounded up to a multiple of epsilon so that rings get reused
+        if self.bonus != GLOBALIST:
+            return epsilon
+        remaining = max(self.remaining(), 0.0)
+        if epsilon > 0:
+            return math.ceil(remaining / epsilon) * epsilon * (1 + TOLERANCE)
+        return remaining
+
+    def charge(self, v, inside, edges):
+        # state after placing v, `inside` telling if its point is in the hole
+        # and `edges` being (u, original, new squared length) to its placed
+        # neighbours; None if the bonus does not allow it
+        used, flex, outside = self.used, self.flex_edge, self.outside
+        if not inside:
+            if not self.outside_free():
+                return None
+            outside = v
+        if self.bonus == GLOBALIST:
+            for _, orig_dist, new_dist in edges:
+                used += stretch(orig_dist, new_dist)
+            if used > self.budget * (1 - TOLERANCE):
+                return None
+            return used, flex, outside
+        for u, orig_dist, new_dist in edges:
+            if not self.fits(orig_dist, new_dist):
+                if self.bonus != SUPERFLEX or flex is not None:
+                    return None
+                flex = (u, v)
+        return used, flex, outside
+
+    def take(self, state):
+        # move to a state from charge(), returns the old one for restore()
+        old = (self.used, self.flex_edge, self.outside)
+        self.used, self.flex_edge, self.outside = state
+        return old
+
+    def restore(self, state):
+        self.used, self.flex_edge, self.outside = state
+
+    def __str__(self):
+        if self.bonus == GLOBALIST:
+            return f'{self.bonus}: {self.used:.6f} of {self.budget:.6f} used'
+        if self.bonus == SUPERFLEX:
+            return f'{self.bonus}: edge {self.flex_edge}'
+        if self.bonus == WALLHACK:
+            return f'{self.bonus}: vertex {self.outside} outside'
+        return self.bonus or 'no bonus'
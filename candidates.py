@@ -0,0 +1,185 @@
+import threading
+from collections import OrderedDict
+from math import floor
+
+import numpy as np
+
+from geometry import hole_raster
+from edge_cache import edge_cache
+
+
+# Bookkeeping per cached array on top of its own buffer
+ENTRY_OVERHEAD = 200
+DEFAULT_MAX_BYTES = 256 * 2**20
+# memory for the ring vectors of all problems together
+RING_VECTORS_MAX_BYTES = 64 * 2**20
+
+
+def check_distance_with_eps(orig_dist, new_dist, epsilon):
+    if abs(1.0 * new_dist / orig_dist - 1) <= epsilon:
+        return True
+    return False
+
+
+def viable_vectors(len2, epsilon):
+    # Lattice vectors (x >= 0, y >= 0) with squared length within epsilon of len2
+    low2, high2 = len2 * (1 - epsilon), len2 * (1 + epsilon)
+    high = floor(high2 ** 0.5)
+    x, x2 = 0, 0
+    vectors = []
+    while x2 <= high2:
+        while high >= 0 and x2 + high * high > high2:
+            high -= 1
+        y = high
+        while y >= 0 and x2 + y * y >= low2:
+            if check_distance_with_eps(orig_dist=len2, new_dist=x2 + y * y, epsilon=epsilon):
+                vectors.append((x, y))
+            y -= 1
+        x += 1
+        x2 = x * x
+    return vectors
+
+
+def ring_vectors(len2, epsilon):
+    # viable_vectors mirrored into all four quadrants, each vector once, as int32 (K, 2)
+    key = (len2, epsilon)
+    res = _RING_VECTORS.lookup(key)
+    if res is not None:
+        return res
+
+    vectors = np.array(viable_vectors(len2, epsilon), dtype=np.int32).reshape(-1, 2)
+    quads = np.concatenate([vectors * np.array(s, dtype=np.int32) for s in ((1, 1), (1, -1), (-1, 1), (-1, -1))])
+    # points on the axes show up in two quadrants
+    _, first = np.unique(quads, axis=0, return_index=True)
+    return _RING_VECTORS.store(key, quads[np.sort(first)])
+
+
+class RingTable:
+    # Ring vectors for every distinct figure edge length of a problem, built once.
+    def __init__(self, spec, epsilon=None):
+        self.epsilon = spec['epsilon'] / 1000000.0 if epsilon is None else epsilon
+        vertices = spec['figure']['vertices']
+        lens = set()
+        for a, b in spec['figure']['edges']:
+            lens.add((vertices[a][0] - vertices[b][0]) ** 2 + (vertices[a][1] - vertices[b][1]) ** 2)
+        self.vectors = {len2: ring_vectors(len2, self.epsilon) for len2 in sorted(lens)}
+
+    def __getitem__(self, len2):
+        if len2 not in self.vectors:
+            self.vectors[len2] = ring_vectors(len2, self.epsilon)
+        return self.vectors[len2]
+
+    def smallest(self, len2s):
+        # position of the length with the fewest ring points
+        return min(range(len(len2s)), key=lambda i: len(self[len2s[i]]))
+
+
+def intersect_rings(points, origins, len2s, epsilon):
+    # Rows of `points` within epsilon of len2s[i] from origins[i], for every i
+    if len(origins) == 0 or len(points) == 0:
+        return points
+    o = np.asarray(origins, dtype=np.int64).reshape(-1, 2)
+    l = np.asarray(len2s, dtype=np.float64)
+    d = ((points[:, None, :].astype(np.int64) - o[None, :, :]) ** 2).sum(axis=2)
+    # same float check as check_distance_with_eps
+    return points[(np.abs(d / l[None, :] - 1) <= epsilon).all(axis=1)]
+
+
+class ArrayCache:
+    # LRU cache of read-only numpy arrays within a memory budget. Lookups take
+    # a lock, so one cache can serve several solvers.
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def lookup(self, key):
+        with self.lock:
+            arr = self.entries.get(key)
+            if arr is not None:
+                self.hits += 1
+                self.entries.move_to_end(key)
+            else:
+                self.misses += 1
+            return arr
+
+    def store(self, key, arr):
+        arr.flags.writeable = False
+        with self.lock:
+            if key in self.entries:
+                return self.entries[key]
+            self.entries[key] = arr
+            self.nbytes += arr.nbytes + ENTRY_OVERHEAD
+            while self.nbytes > self.max_bytes and len(self.entries) > 1:
+                _, old = self.entries.popitem(last=False)
+                self.nbytes -= old.nbytes + ENTRY_OVERHEAD
+                self.evictions += 1
+        return arr
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'bytes': self.nbytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+
+# ring vectors by (len2, epsilon), for every problem
+_RING_VECTORS = ArrayCache(RING_VECTORS_MAX_BYTES)
+
+
+class CandidateCache(ArrayCache):
+    # LRU cache of candidate points around a placed vertex, as int32 (K, 2) arrays.
+    # Two layers share one memory budget:
+    #   ring(origin, len2, eps)         - all lattice points at that distance
+    #   inside_ring(origin, len2, eps)  - the ones of the ring in the hole, with
+    #                                     the edge from origin inside it too
+    def __init__(self, spec, max_bytes=DEFAULT_MAX_BYTES):
+        ArrayCache.__init__(self, max_bytes)
+        self.spec = spec
+
+    def ring(self, origin, len2, epsilon):
+        key = (int(origin[0]), int(origin[1]), len2, epsilon)
+        arr = self.lookup(key)
+        if arr is None:
+            arr = self.store(key, ring_vectors(len2, epsilon) + np.array(origin, dtype=np.int32))
+        return arr
+
+    def inside_ring(self, origin, len2, epsilon):
+        # Ring points inside the hole that origin can reach with an edge inside the hole
+        key = (int(origin[0]), int(origin[1]), len2, epsilon, 'inside')
+        arr = self.lookup(key)
+        if arr is None:
+            ring = self.ring(origin, len2, epsilon)
+            ring = ring[hole_raster(self.spec).contains_many(ring)]
+            cache = edge_cache(self.spec)
+            origin = (int(origin[0]), int(origin[1]))
+            keep = np.fromiter((cache.is_edge_inside(origin, pt) for pt in map(tuple, ring.tolist())),
+                               dtype=bool, count=len(ring))
+            arr = self.store(key, ring[keep])
+        return arr
+
+    def __str__(self):
+        s = self.stats()
+        return 'candidate cache: {} entries ({:.1f} MB), {} hits, {} misses ({:.1%} hit rate), {} evictions'.format(
+            s['entries'], s['bytes'] / 2**20, s['hits'], s['misses'], s['hit_rate'], s['evictions'])
+
+
+def candidate_cache(spec, max_bytes=DEFAULT_MAX_BYTES):
+    # Per-problem candidate cache shared by every solver holding the same spec.
+    if 'candidate_cache' not in spec:
+        spec['candidate_cache'] = CandidateCache(spec, max_bytes)
+    return spec['candidate_cache']
+
+
+def as_points(arr):
+    # int32 (K, 2) array -> list of (x, y) tuples of python ints
+    return [tuple(pt) for pt in arr.tolist()]
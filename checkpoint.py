@@ -0,0 +1,45 @@
+import json
+import os
+
+
+CHECKPOINT_DIR = 'cache/checkpoints'
+
+
+def checkpoint_path(problem_id, checkpoint_dir=CHECKPOINT_DIR):
+    return os.path.join(checkpoint_dir, f'{problem_id}.json')
+
+
+def save_checkpoint(path, snapshot):
+    # Written to a temporary file first and renamed over the old one, so a
+    # run killed in the middle leaves the previous snapshot whole.
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = '{}.tmp.{}'.format(path, os.getpid())
+    with open(tmp, 'wt') as f:
+        json.dump(snapshot, f, separators=(',', ':'))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path):
+    with open(path, 'rt') as f:
+        return json.load(f)
+
+
+def encode_frames(frames):
+    # search position [(values, pos)] with point values -> [[flat coords, pos]]
+    return [[[c for pt in values for c in pt], pos] for values, pos in frames]
+
+
+def decode_frames(frames):
+    return [([(xs[i], xs[i + 1]) for i in range(0, len(xs), 2)], pos) for xs, pos in frames]
+
+
+def encode_rng(rng):
+    version, state, gauss = rng.getstate()
+    return [version, list(state), gauss]
+
+
+def decode_rng(rng, state):
+    version, internal, gauss = state
+    rng.setstate((version, tuple(internal), gauss))
@@ -1,8 +1,12 @@
 
-import copy
-from utils import read_problem
 import sys
-from collections import defaultdict, deque
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from utils import read_problem
+from search import DepthFirstSearch
 
 
 problem_id = sys.argv[1]
@@ -28,8 +32,32 @@ def get_hole_nodes():
 def get_figure_nodes():
     return [21, 25, 40, 43, 42, 47, 51, 54, 57, 59, 58]
 
-class ClickSolver:
+def compatibility_matrix(spec, nodes, v_nodes, adj):
+    # compat[i, j, a, b]: hole nodes[i], nodes[j] can take figure v_nodes[a], v_nodes[b],
+    # i.e. the two figure vertices aren't joined by an edge or the hole distance fits it
+    hole = np.asarray(spec['hole'], dtype=np.int64)[nodes]
+    vertices = np.asarray(spec['figure']['vertices'], dtype=np.int64)[v_nodes]
+    hole_d = ((hole[:, None, :] - hole[None, :, :]) ** 2).sum(axis=2)
+    fig_d = ((vertices[:, None, :] - vertices[None, :, :]) ** 2).sum(axis=2)
+    pos = {v: a for a, v in enumerate(v_nodes)}
+    edge = np.zeros((len(v_nodes), len(v_nodes)), dtype=bool)
+    for v in v_nodes:
+        for u in adj[v]:
+            if u in pos:
+                edge[pos[v], pos[u]] = True
+    # same check as check_distance
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fits = np.abs(hole_d[:, :, None, None] / fig_d[None, None, :, :] - 1) <= spec['epsilon'] / 10**6
+    return ~edge[None, None, :, :] | fits
+
+
+class ClickSolver(DepthFirstSearch):
+    # Finds every injective hole node -> figure node assignment that keeps the
+    # figure edges between the chosen figure nodes. Each hole node keeps a
+    # bitmask of figure nodes still possible (forward checking over the
+    # compatibility matrix); the hole node with the fewest goes next.
     def __init__(self, spec):
+        DepthFirstSearch.__init__(self)
         self.spec = spec
         self.adj = defaultdict(list)
         for (a, b) in sorted(self.spec['figure']['edges']):
@@ -37,58 +65,66 @@ class ClickSolver:
             self.adj[b].append(a)
         self.nodes = get_hole_nodes()
         self.v_nodes = get_figure_nodes()
-        
-    def check_graph_distances(self, solution, hole_idx, v_idx):
-        reverse_mapping = {v: k for k, v in solution.items()}
-        for next_v_idx in self.adj[v_idx]:
-            if next_v_idx in solution.values():
-                next_hole_idx = reverse_mapping[next_v_idx]
-                v_pt =  self.spec['figure']['vertices'][v_idx]
-                next_v_pt = self.spec['figure']['vertices'][next_v_idx]
-                orig_dist = dist2(v_pt, next_v_pt)
-                
-                hole_pt = self.spec['hole'][hole_idx]
-                next_hole_pt = self.spec['hole'][next_hole_idx]
-                new_dist = dist2(hole_pt, next_hole_pt)
-                if not check_distance(self.spec, orig_dist, new_dist):
+
+        compat = compatibility_matrix(spec, self.nodes, self.v_nodes, self.adj)
+        # support[i][a][j]: bitmask of the figure nodes hole node j can still take
+        # once hole node i took figure node a
+        weights = 1 << np.arange(len(self.v_nodes), dtype=object)
+        self.support = [[[int(compat[i, j, a].astype(object) @ weights) & ~(1 << a)
+                          for j in range(len(self.nodes))]
+                         for a in range(len(self.v_nodes))]
+                        for i in range(len(self.nodes))]
+
+    def _set_domain(self, i, bits):
+        self.domains[i] = bits
+
+    def candidates(self, depth):
+        # most constrained hole node next, its figure nodes in index order
+        i = min(self.free, key=lambda j: self.domains[j].bit_count())
+        self.order[depth] = i
+        bits = self.domains[i]
+        return [a for a in range(len(self.v_nodes)) if bits >> a & 1]
+
+    def assign(self, depth, a):
+        i = self.order[depth]
+        trail = self.trail
+        self.free.remove(i)
+        trail.push(self.free.add, i)
+        self.assigned[i] = a
+        trail.push(self.assigned.pop, i)
+        support = self.support[i][a]
+        for j in self.free:
+            bits = self.domains[j] & support[j]
+            if bits != self.domains[j]:
+                trail.push(self._set_domain, j, self.domains[j])
+                self.domains[j] = bits
+                if not bits:
                     return False
         return True
 
-
-    def solve(self):
-        start = {}
-
-        q = deque()
-        q.append(start)
-
-        visited = set()
-        count = 0
-        while q:
-            solution = q.popleft()
-            if len(solution) == len(self.nodes):
-                print ('====')
-                print ('Found solution:')
-                for k, v in sorted(solution.items()):
-                    print ('  hole {} to {}'.format(k, v))
-                # break
-            # print ('count = {} -> solution = {}'.format(count, solution))
-            for hole_idx in self.nodes:
-                if hole_idx in solution:
-                    continue
-                for v_idx in self.v_nodes:
-                    if v_idx in solution.values():
-                        continue
-                    # chek all adjacent
-                    if not self.check_graph_distances(solution, hole_idx, v_idx):
-                        continue
-                    next_solution = copy.copy(solution)
-                    next_solution[hole_idx] = v_idx
-                    key = tuple(sorted(next_solution))
-                    if key in visited:
-                        continue
-                    visited.add(key)
-                    q.append(next_solution)
-            count += 1
+    def leaf(self):
+        solution = {self.nodes[i]: self.v_nodes[a] for i, a in self.assigned.items()}
+        self.solutions.append(solution)
+        print ('====')
+        print ('Found solution:')
+        for k, v in sorted(solution.items()):
+            print ('  hole {} to {}'.format(k, v))
+
+    def should_stop(self):
+        return self.limit is not None and len(self.solutions) >= self.limit
+
+    def solve(self, limit=None):
+        start = time.time()
+        self.limit = limit
+        self.solutions = []
+        self.domains = [(1 << len(self.v_nodes)) - 1] * len(self.nodes)
+        self.free = set(range(len(self.nodes)))
+        self.assigned = {}
+        self.order = [None] * len(self.nodes)
+        self.search(len(self.nodes))
+        print ('{} solutions, {} search nodes in {:.3f}s'.format(
+            len(self.solutions), self.search_nodes, time.time() - start))
+        return self.solutions
 
 
 solver = ClickSolver(spec)
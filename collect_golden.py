@@ -1,17 +1,33 @@
 #!/usr/bin/env python3
 
+import json
 import os
 
 from typing import Tuple
 
+from absl import app
+from absl import flags
 from shapely.geometry import Point, Polygon
 import shutil
 
 from utils import read_problem, read_json
+from edge_cache import edge_cache
+from batch_validate import validate_batch
+from dislikes import count_dislikes as count_dislikes_of
+from solution_log import LOG_DIR, log_path, read_bests
+from bonuses import BREAK_A_LEG, BonusBudget, bonus_sources, break_leg, solution_bonus
+from geometry import hole_raster
 
 
+FLAGS = flags.FLAGS
+
+flags.DEFINE_bool('bonus_golden', False, 'Also keep the best solution using a bonus in solutions/golden_bonus/<id>. '
+                  'The bonus is only checked to be offered by some problem, not to be unlocked by us.')
+
 LAST_PROBLEM = 132
 EPSILON = 1e-6
+# solutions/golden only gets strict solutions, the ones we can always submit
+BONUS_GOLDEN_DIR = 'solutions/golden_bonus'
 
 DEBUG = True
 
@@ -70,17 +86,25 @@ def is_edge_not_overlapping_hole(spec, A: Tuple, B: Tuple):
 
 def is_edge_inside(spec, A: Tuple, B: Tuple):
     # Check if AB is fully within the hole
-    vals = [is_inside(spec['hole_poly'], *point_average(A, B, a), EPSILON) for a in (0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1)]
-    if not all(vals):
-        # print ('not all inside: ', vals)
-        return False
-    return is_edge_not_overlapping_hole(spec, A, B)
+    return edge_cache(spec).is_edge_inside(A, B)
 
 def validate_solution(spec, solution):
     if 'vertices' not in solution:
         return False
+    try:
+        bonus = solution_bonus(solution)
+        if bonus is not None and bonus['bonus'] == BREAK_A_LEG:
+            spec = break_leg(spec, bonus['edge'])
+    except (ValueError, KeyError, TypeError) as e:
+        if DEBUG:
+            print ('  Bad bonuses {}: {}'.format(solution.get('bonuses'), e))
+        return False
     new_vertices = solution['vertices']
     old_vertices = spec['figure']['vertices']
+    if len(new_vertices) != len(old_vertices):
+        if DEBUG:
+            print ('  {} vertices instead of {}'.format(len(new_vertices), len(old_vertices)))
+        return False
 
     # check that coordinates integers
     for (x, y) in new_vertices:
@@ -89,19 +113,31 @@ def validate_solution(spec, solution):
                 print ('  Coordinates ({}, {}) are not integers'.format(x, y))
             return False
 
-    # check distances
+    # check distances, with what the bonus lets through vertex by vertex
+    budget = BonusBudget(spec, bonus['bonus'] if bonus else None)
+    raster = hole_raster(spec)
+    earlier = [[] for _ in new_vertices]
     for (a, b) in spec['figure']['edges']:
-        orig_dist = dist2(old_vertices[a], old_vertices[b])
-        new_dist = dist2(new_vertices[a], new_vertices[b])
-        ok = check_distance(spec, orig_dist, new_dist)
-        if not ok:
+        earlier[max(a, b)].append(min(a, b))
+    for v, (x, y) in enumerate(new_vertices):
+        edges = [(u, dist2(old_vertices[u], old_vertices[v]), dist2(new_vertices[u], new_vertices[v]))
+                 for u in earlier[v]]
+        state = budget.charge(v, raster.contains(int(x), int(y)), edges)
+        if state is None:
             if DEBUG:
-                print ('  Edge ({}, {}) has wrong size: {} (orig={})'.format(
-                    a, b, new_dist, orig_dist))
+                for u, orig_dist, new_dist in edges:
+                    if not check_distance(spec, orig_dist, new_dist):
+                        print ('  Edge ({}, {}) has wrong size: {} (orig={})'.format(
+                            u, v, new_dist, orig_dist))
+                print ('  Vertex {} ({}, {}) does not fit: {}'.format(v, x, y, budget))
             return False
-    
+        budget.take(state)
+
     # check that all edges are not intersecting
     for (a, b) in spec['figure']['edges']:
+        if budget.outside in (a, b):
+            # WALLHACK: the edges of the vertex out of the hole may leave it
+            continue
         A = new_vertices[a]
         B = new_vertices[b]
         if not is_edge_inside(spec, A, B):
@@ -113,13 +149,37 @@ def validate_solution(spec, solution):
 
 
 def count_dislikes(spec, solution):
-    total_dislikes = 0
-    for hole_pt in spec['hole']:
-        min_dist = min(dist2(hole_pt, pt) for pt in solution['vertices'])
-        total_dislikes += min_dist
-    return total_dislikes
+    return count_dislikes_of(spec['hole'], solution['vertices'])
+
+
+def bonus_offered(problem_id, solution):
+    # the bonus a solution uses (if any) is one some problem unlocks for this one
+    bonus = solution_bonus(solution)
+    return bonus is None or int(bonus['problem']) in bonus_sources(problem_id, bonus['bonus'])
 
-def main():
+def write_golden(path, file, logged):
+    if file in logged:
+        golden = {'vertices': logged[file]['vertices']}
+        if logged[file].get('bonuses'):
+            golden['bonuses'] = logged[file]['bonuses']
+        with open(path, 'wt') as f:
+            f.write(json.dumps(golden))
+    else:
+        shutil.copyfile(file, path)
+
+
+def best_candidate(candidates):
+    best_file, best_dislikes = None, None
+    for file, dislikes in candidates:
+        if DEBUG:
+            print ('  solution {} is OK, dislikes = {}'.format(file, dislikes))
+        if best_dislikes is None or dislikes < best_dislikes:
+            best_dislikes = dislikes
+            best_file = file
+    return best_file, best_dislikes
+
+
+def main(argv):
     solutions = {}
     for i in range(1, LAST_PROBLEM + 1):
         i_str = str(i)
@@ -127,6 +187,9 @@ def main():
 
     for (dirpath, dirnames, filenames) in os.walk("solutions/"):
         # print (dirpath, dirnames, filenames)
+        # solution logs are read through their best pointers below
+        if os.path.normpath(dirpath) == os.path.dirname(os.path.normpath(LOG_DIR)):
+            dirnames[:] = [d for d in dirnames if d != os.path.basename(LOG_DIR)]
         for file in filenames:
             full_path = os.path.join(dirpath, file)
             # skip golden solutions
@@ -135,35 +198,72 @@ def main():
             problem_id = file.split('_', 1)[0]
             if problem_id in solutions:
                 solutions[problem_id].append(full_path)
-                
+
+    if FLAGS.bonus_golden:
+        os.makedirs(BONUS_GOLDEN_DIR, exist_ok=True)
     for i in range(1, LAST_PROBLEM + 1):
         i_str = str(i)
         print ('i={}, num={} -> {}'.format(i, len(solutions[i_str]), solutions[i_str]))
         spec = read_problem(i)
         spec['hole_poly'] = Polygon(spec['hole'])
 
-        best_dislikes = None
-        best_file = None
-
-        for file in solutions[i_str]:
+        num_vertices = len(spec['figure']['vertices'])
+
+        # solutions with the regular shape are validated in one batch,
+        # anything else goes through the scalar check
+        candidates = []
+        bonus_candidates = []
+        batch_files = []
+        batch_vertices = []
+        # the best logged entry for every bonus, 'none' being the strict one
+        logged = {}
+        for key, entry in read_bests(i).items():
+            logged[log_path(i) if key == 'none' else '{}#{}'.format(log_path(i), key)] = entry
+        for file in solutions[i_str] + list(logged):
             if DEBUG:
                 print('processing {}'.format(file))
-            solution = read_json(file)
-            ok = validate_solution(spec, solution)
-            if ok:
-                dislikes = count_dislikes(spec, solution)
-                if DEBUG:
-                    print ('  solution {} is OK, dislikes = {}'.format(file, dislikes))
-                if best_dislikes is None or dislikes < best_dislikes:
-                    best_dislikes = dislikes
-                    best_file = file
-
+            solution = logged[file] if file in logged else read_json(file)
+            if solution.get('bonuses'):
+                # solutions using a bonus are checked by its rules, one at a time,
+                # and never become the golden one
+                if not FLAGS.bonus_golden:
+                    continue
+                try:
+                    offered = bonus_offered(i, solution)
+                except (ValueError, KeyError, TypeError):
+                    offered = False
+                if not offered:
+                    if DEBUG:
+                        print ('  solution {}: bonus {} is not offered to problem {}'.format(
+                            file, solution['bonuses'], i))
+                elif validate_solution(spec, solution):
+                    bonus_candidates.append((file, count_dislikes(spec, solution)))
+            elif 'vertices' in solution and len(solution['vertices']) == num_vertices:
+                batch_files.append(file)
+                batch_vertices.append(solution['vertices'])
+            elif validate_solution(spec, solution):
+                candidates.append((file, count_dislikes(spec, solution)))
+
+        if batch_files:
+            result = validate_batch(spec, batch_vertices)
+            for file, ok, reason, dislikes in zip(batch_files, result.valid, result.reasons, result.dislikes):
+                if ok:
+                    candidates.append((file, int(dislikes)))
+                elif DEBUG:
+                    print ('  solution {}: {}'.format(file, reason))
+
+        best_file, best_dislikes = best_candidate(candidates)
         if best_dislikes is not None:
             print ('  best solution = {} ({})'.format(best_dislikes, best_file))
-            shutil.copyfile(best_file, f"solutions/golden/{i}")
+            write_golden(f"solutions/golden/{i}", best_file, logged)
+
+        bonus_file, bonus_dislikes = best_candidate(bonus_candidates)
+        if bonus_dislikes is not None:
+            print ('  best solution with a bonus = {} ({})'.format(bonus_dislikes, bonus_file))
+            write_golden(os.path.join(BONUS_GOLDEN_DIR, i_str), bonus_file, logged)
 
 # def test_intersect():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    app.run(main)
\ No newline at end of file
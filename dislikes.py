@@ -0,0 +1,137 @@
+import heapq
+
+import numpy as np
+
+from nearest import PointGrid
+
+
+# Distance of a hole vertex with nothing placed yet
+FAR = 1 << 60
+
+# float slack on the reach radius (see reach_lower_bound)
+TOLERANCE = 1e-9
+
+# max number of elements in the temporary (hole x placed x unplaced) array of reach_lower_bound
+CHUNK_ELEMENTS = 1 << 20
+
+
+class DislikesTracker:
+    # Dislikes of a partial placement, updated as figure vertices come and go.
+    # For every hole vertex keeps the multiset of squared distances to the placed
+    # points as a heap with lazy deletion; nearest[h] is its minimum.
+    def __init__(self, hole, points=()):
+        self.hole = [(int(x), int(y)) for x, y in hole]
+        self.hole_arr = np.asarray(self.hole, dtype=np.int64)
+        self.heaps = [[] for _ in self.hole]
+        self.removed = [{} for _ in self.hole]
+        self.nearest = [FAR] * len(self.hole)
+        self.count = 0
+        for pt in points:
+            self.place(pt)
+
+    def place(self, pt):
+        x, y = pt
+        nearest = self.nearest
+        for h, (hx, hy) in enumerate(self.hole):
+            d = (hx - x) ** 2 + (hy - y) ** 2
+            heapq.heappush(self.heaps[h], d)
+            if d < nearest[h]:
+                nearest[h] = d
+        self.count += 1
+
+    def unplace(self, pt):
+        x, y = pt
+        nearest = self.nearest
+        self.count -= 1
+        for h, (hx, hy) in enumerate(self.hole):
+            d = (hx - x) ** 2 + (hy - y) ** 2
+            removed = self.removed[h]
+            removed[d] = removed.get(d, 0) + 1
+            heap = self.heaps[h]
+            if d == nearest[h]:
+                while heap and removed.get(heap[0], 0):
+                    removed[heap[0]] -= 1
+                    heapq.heappop(heap)
+                nearest[h] = heap[0] if heap else FAR
+            if len(heap) > 2 * self.count + 32:
+                self._compact(h)
+
+    def _compact(self, h):
+        # drop lazily deleted entries buried in the heap
+        removed = self.removed[h]
+        heap = []
+        for d in self.heaps[h]:
+            if removed.get(d, 0):
+                removed[d] -= 1
+            else:
+                heap.append(d)
+        heapq.heapify(heap)
+        self.heaps[h] = heap
+        removed.clear()
+
+    def score(self):
+        return sum(self.nearest)
+
+    def score_if_placed(self, pt):
+        x, y = pt
+        total = 0
+        for (hx, hy), d in zip(self.hole, self.nearest):
+            total += min(d, (hx - x) ** 2 + (hy - y) ** 2)
+        return total
+
+    def score_if_added(self, points):
+        # score with all of `points` placed on top of the current ones; a lower
+        # bound on the score after moving vertices to them
+        total = 0
+        for (hx, hy), d in zip(self.hole, self.nearest):
+            for x, y in points:
+                e = (hx - x) ** 2 + (hy - y) ** 2
+                if e < d:
+                    d = e
+            total += d
+        return total
+
+    def bounded_score(self, reach):
+        # lower bound on the final score, given for every hole vertex a lower
+        # bound on its squared distance to the vertices still to be placed
+        return sum(d if d < r else r for d, r in zip(self.nearest, reach))
+
+    def score_candidates(self, points):
+        # score_if_placed for every row of a (K, 2) array of points
+        points = np.asarray(points, dtype=np.int64).reshape(-1, 2)
+        d = ((points[:, None, :] - self.hole_arr[None, :, :]) ** 2).sum(axis=2)
+        return np.minimum(d, np.asarray(self.nearest, dtype=np.int64)[None, :]).sum(axis=1)
+
+
+def count_dislikes(hole, points):
+    # Sum over hole vertices of the squared distance to the closest point
+    grid = PointGrid(points)
+    return sum(grid.nearest(pt)[0] for pt in hole)
+
+
+def reach_lower_bound(hole, dist, epsilon, placed, positions, unplaced):
+    # For every hole vertex a lower bound on the squared distance to any point
+    # the `unplaced` vertices can still take, as a list of ints (FAR when there
+    # is nothing left to place). Every edge stretches by at most
+    # sqrt(1 + epsilon), so u stays within sqrt(1 + epsilon) * dist[p, u] of
+    # each placed p, that is in every one of these discs at once: its gap to a
+    # hole vertex is the largest gap to the discs. This does not depend on the
+    # order `placed` comes in.
+    hole = np.asarray(hole, dtype=np.float64).reshape(-1, 2)
+    if len(unplaced) == 0:
+        return [FAR] * len(hole)
+    if len(placed) == 0:
+        return [0] * len(hole)
+    radius = dist[np.ix_(np.asarray(placed), np.asarray(unplaced))] * np.sqrt(1 + epsilon) * (1 + TOLERANCE)
+    centers = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+    # hole vertices x placed
+    to_centers = np.sqrt(((hole[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2))
+    gap = np.full(len(hole), np.inf)
+    step = max(1, CHUNK_ELEMENTS // (len(hole) * len(placed)))
+    for start in range(0, len(unplaced), step):
+        # hole vertices x placed x unplaced
+        per_disc = to_centers[:, :, None] - radius[None, :, start:start + step]
+        gap = np.minimum(gap, per_disc.max(axis=1).min(axis=1))
+    gap = np.maximum(gap, 0)
+    # squared distances between lattice points are integers
+    return np.floor(gap * gap * (1 - TOLERANCE)).astype(np.int64).tolist()
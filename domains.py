@@ -0,0 +1,212 @@
+import heapq
+from collections import OrderedDict
+
+import numpy as np
+
+from geometry import hole_raster
+from candidates import candidate_cache
+
+
+DEFAULT_RING_CACHE_BYTES = 128 * 2**20
+
+
+class Domains:
+    # Remaining positions of every figure vertex as a bitset over the inside
+    # points of the hole (bit i <-> raster.points[i]), stored as python ints.
+    #
+    # assign() pins a vertex to a point and propagates along figure edges:
+    # neighbours keep only the points on the ring around it that are joined by
+    # an edge inside the hole, and every domain that shrinks to at most
+    # `ac_limit` points passes the restriction on to its own neighbours (those
+    # only keep the inside points of the rings, checking edges against the
+    # hole for every point of a domain costs more than it prunes).
+    # All changes go on a trail, undo(mark) rolls them back. `listener`, if
+    # set, is called with every vertex whose domain changes either way.
+    def __init__(self, spec, adj, epsilon, ac_limit=64, ring_cache_bytes=DEFAULT_RING_CACHE_BYTES):
+        self.spec = spec
+        self.raster = hole_raster(spec)
+        self.candidates = candidate_cache(spec)
+        self.epsilon = epsilon
+        self.ac_limit = ac_limit
+        self.num_points = len(self.raster.points)
+        self.nbytes = (self.num_points + 7) // 8
+
+        vertices = spec['figure']['vertices']
+        self.adj = [[] for _ in vertices]
+        for v, neibs in adj.items():
+            for u in neibs:
+                len2 = (vertices[u][0] - vertices[v][0]) ** 2 + (vertices[u][1] - vertices[v][1]) ** 2
+                self.adj[v].append((u, len2))
+
+        full = (1 << self.num_points) - 1
+        self.domains = [full] * len(vertices)
+        self.assigned = [False] * len(vertices)
+        self.trail = []
+
+        self.ring_cache = OrderedDict()
+        self.max_ring_entries = max(1, ring_cache_bytes // (self.nbytes + 100))
+        self.wipeouts = 0
+        self.listener = None
+
+    def mark(self):
+        return len(self.trail)
+
+    def undo(self, mark):
+        trail = self.trail
+        domains = self.domains
+        listener = self.listener
+        while len(trail) > mark:
+            v, old, assigned = trail.pop()
+            domains[v] = old
+            self.assigned[v] = assigned
+            if listener is not None:
+                listener(v)
+
+    def _set(self, v, bits, assigned=None):
+        self.trail.append((v, self.domains[v], self.assigned[v]))
+        self.domains[v] = bits
+        if assigned is not None:
+            self.assigned[v] = assigned
+        if self.listener is not None:
+            self.listener(v)
+
+    def bits_of(self, pts):
+        # bitset of the given inside points (int (K, 2) array)
+        flags = np.zeros(self.num_points, dtype=bool)
+        if len(pts):
+            pts = np.asarray(pts, dtype=np.int64)
+            idx = self.raster.index[pts[:, 1] - self.raster.ymin, pts[:, 0] - self.raster.xmin]
+            flags[idx] = True
+        return int.from_bytes(np.packbits(flags, bitorder='little').tobytes(), 'little')
+
+    def points_of(self, bits):
+        # inside points of a bitset, in index order
+        return [tuple(pt) for pt in self.raster.points[self.indices(bits)].tolist()]
+
+    def indices(self, bits):
+        if bits.bit_count() <= 32:
+            res = []
+            while bits:
+                low = bits & -bits
+                res.append(low.bit_length() - 1)
+                bits ^= low
+            return np.array(res, dtype=np.int64)
+        raw = np.frombuffer(bits.to_bytes(self.nbytes, 'little'), dtype=np.uint8)
+        return np.nonzero(np.unpackbits(raw, bitorder='little'))[0]
+
+    def ring_bits(self, i, len2, edges=True):
+        # bitset of the inside points at distance len2 from inside point i,
+        # with edges=True only those joined to it by an edge inside the hole
+        key = (i, len2, edges)
+        cache = self.ring_cache
+        bits = cache.get(key)
+        if bits is None:
+            pt = (int(self.raster.points[i][0]), int(self.raster.points[i][1]))
+            if edges:
+                ring = self.candidates.inside_ring(pt, len2, self.epsilon)
+            else:
+                ring = self.candidates.ring(pt, len2, self.epsilon)
+                ring = ring[self.raster.contains_many(ring)]
+            bits = self.bits_of(ring)
+            cache[key] = bits
+            if len(cache) > self.max_ring_entries:
+                cache.popitem(last=False)
+        else:
+            cache.move_to_end(key)
+        return bits
+
+    def size(self, v):
+        return self.domains[v].bit_count()
+
+    def assign(self, v, pt):
+        # Pin v to pt and propagate. False if some domain became empty
+        # (the caller is expected to undo to its mark).
+        i = self.raster.point_index(pt[0], pt[1])
+        if i < 0 or not (self.domains[v] >> i) & 1:
+            return False
+        self._set(v, 1 << i, assigned=True)
+
+        domains = self.domains
+        queue = [v]
+        while queue:
+            x = queue.pop()
+            indices = self.indices(domains[x]) if domains[x].bit_count() <= self.ac_limit else None
+            if indices is None:
+                continue
+            exact = self.assigned[x]
+            for u, len2 in self.adj[x]:
+                if self.assigned[u]:
+                    continue
+                support = 0
+                for j in indices.tolist():
+                    support |= self.ring_bits(j, len2, exact)
+                new = domains[u] & support
+                if new != domains[u]:
+                    if not new:
+                        self.wipeouts += 1
+                        return False
+                    self._set(u, new)
+                    queue.append(u)
+        return True
+
+
+class VertexOrder:
+    # Most constrained unplaced vertex first: fewest points left in its
+    # domain, then most placed neighbours, then highest degree. Keys change
+    # through Domains.listener and place/unplace; every change pushes a new
+    # heap entry and bumps the version of the vertex, entries with an old
+    # version or for a placed vertex are dropped when they come to the top.
+    def __init__(self, domains, placed=()):
+        self.domains = domains
+        n = len(domains.adj)
+        self.adj = [[u for u, _ in neibs] for neibs in domains.adj]
+        self.degree = [len(neibs) for neibs in self.adj]
+        self.placed = [False] * n
+        self.placed_neibs = [0] * n
+        self.version = [0] * n
+        self.heap = []
+        for v in placed:
+            self.placed[v] = True
+            for u in self.adj[v]:
+                self.placed_neibs[u] += 1
+        for v in range(n):
+            self.touch(v)
+        domains.listener = self.touch
+
+    def touch(self, v):
+        if self.placed[v]:
+            return
+        version = self.version[v] + 1
+        self.version[v] = version
+        key = (self.domains.domains[v].bit_count(), -self.placed_neibs[v], -self.degree[v], v)
+        heapq.heappush(self.heap, (key, version))
+        if len(self.heap) > 4 * len(self.version) + 64:
+            self._compact()
+
+    def _compact(self):
+        self.heap = [e for e in self.heap if not self.placed[e[0][3]] and e[1] == self.version[e[0][3]]]
+        heapq.heapify(self.heap)
+
+    def place(self, v):
+        self.placed[v] = True
+        for u in self.adj[v]:
+            self.placed_neibs[u] += 1
+            self.touch(u)
+
+    def unplace(self, v):
+        self.placed[v] = False
+        for u in self.adj[v]:
+            self.placed_neibs[u] -= 1
+            self.touch(u)
+        self.touch(v)
+
+    def best(self):
+        # the unplaced vertex to place next, None when all are placed
+        heap = self.heap
+        while heap:
+            key, version = heap[0]
+            v = key[3]
+            if not self.placed[v] and version == self.version[v]:
+                return v
+            heapq.heappop(heap)
+        return None
@@ -0,0 +1,66 @@
+from collections import OrderedDict
+
+from geometry import hole_index
+
+
+# Rough footprint of one OrderedDict entry (int key, bool value, links)
+ENTRY_BYTES = 120
+DEFAULT_MAX_BYTES = 64 * 2**20
+
+
+def pack_edge(A, B):
+    # Normalized (A, B) pair packed into a single 64-bit key, 16 bits per coordinate
+    ax, ay, bx, by = int(A[0]), int(A[1]), int(B[0]), int(B[1])
+    if (bx, by) < (ax, ay):
+        ax, ay, bx, by = bx, by, ax, ay
+    return ((ax & 0xffff) << 48) | ((ay & 0xffff) << 32) | ((bx & 0xffff) << 16) | (by & 0xffff)
+
+
+class EdgeCache:
+    # LRU memo of edge validity checks keyed by the packed endpoint pair.
+    def __init__(self, check_fn, max_bytes=DEFAULT_MAX_BYTES):
+        self.check_fn = check_fn
+        self.max_entries = max(1, max_bytes // ENTRY_BYTES)
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def is_edge_inside(self, A, B):
+        key = pack_edge(A, B)
+        entries = self.entries
+        res = entries.get(key)
+        if res is not None:
+            self.hits += 1
+            entries.move_to_end(key)
+            return res
+
+        self.misses += 1
+        res = self.check_fn(A, B)
+        entries[key] = res
+        if len(entries) > self.max_entries:
+            entries.popitem(last=False)
+            self.evictions += 1
+        return res
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+    def __str__(self):
+        s = self.stats()
+        return 'edge cache: {} entries, {} hits, {} misses ({:.1%} hit rate), {} evictions'.format(
+            s['entries'], s['hits'], s['misses'], s['hit_rate'], s['evictions'])
+
+
+def edge_cache(spec, max_bytes=DEFAULT_MAX_BYTES):
+    # Per-problem edge validity cache shared by everything holding the same spec.
+    if 'edge_cache' not in spec:
+        spec['edge_cache'] = EdgeCache(hole_index(spec).is_segment_inside, max_bytes)
+    return spec['edge_cache']
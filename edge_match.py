@@ -0,0 +1,91 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+
+# float slack on the bisect window, the exact check runs on everything inside it
+TOLERANCE = 1e-9
+
+
+def check_distance(spec, orig_dist, new_dist):
+    if abs(1.0 * new_dist / orig_dist - 1) <= spec['epsilon'] / 10**6:
+        return True
+    return False
+
+
+def dist2(pt1, pt2):
+    x1, y1 = pt1
+    x2, y2 = pt2
+    return (x1 - x2) ** 2 + (y1 - y2) ** 2
+
+
+class EdgeLengthIndex:
+    # Figure edges sorted by squared length. A query for a squared distance
+    # bisects the epsilon window around it instead of scanning every edge.
+    # Matches come back in the order of sorted(spec['figure']['edges']).
+    def __init__(self, spec):
+        self.spec = spec
+        self.epsilon = spec['epsilon'] / 10**6
+        v = spec['figure']['vertices']
+        edges = [tuple(e) for e in sorted(spec['figure']['edges'])]
+        lens = [dist2(v[a], v[b]) for a, b in edges]
+        # rank = position in the sorted edge list
+        self.order = sorted(range(len(edges)), key=lambda i: lens[i])
+        self.lens = [lens[i] for i in self.order]
+        self.edges = edges
+
+    def _window(self, new_dist):
+        # index range of the edges whose length could be within epsilon of new_dist
+        lo = new_dist / (1 + self.epsilon) * (1 - TOLERANCE)
+        i = bisect_left(self.lens, lo)
+        if self.epsilon >= 1:
+            return i, len(self.lens)
+        hi = new_dist / (1 - self.epsilon) * (1 + TOLERANCE)
+        return i, bisect_right(self.lens, hi)
+
+    def matching_edges(self, new_dist, exclude=()):
+        # figure edges (a, b) that can be stretched to squared length new_dist,
+        # skipping the ones touching a vertex in `exclude`
+        lo, hi = self._window(new_dist)
+        ranks = sorted(self.order[i] for i in range(lo, hi)
+                       if self.lens[i] and check_distance(self.spec, self.lens[i], new_dist))
+        res = []
+        for rank in ranks:
+            a, b = self.edges[rank]
+            if a in exclude or b in exclude:
+                continue
+            res.append((a, b))
+        return res
+
+    def matching_adjacency(self, new_dist):
+        # (vertex -> list of vertices it can be joined to, list of edges)
+        ls = self.matching_edges(new_dist)
+        res = defaultdict(list)
+        for a, b in ls:
+            res[a].append(b)
+            res[b].append(a)
+        return res, ls
+
+    def match_vector(self, dx, dy):
+        # figure edges that fit the lattice vector (dx, dy)
+        return self.matching_edges(dx * dx + dy * dy)
+
+    def match_points(self, pt1, pt2):
+        return self.matching_edges(dist2(pt1, pt2))
+
+    def closest(self, new_dist):
+        # (|new_dist / len - 1|, edge) for the best fitting edge, None without edges
+        i = bisect_left(self.lens, new_dist)
+        best = None
+        for j in (i - 1, i):
+            if 0 <= j < len(self.lens) and self.lens[j]:
+                err = abs(1.0 * new_dist / self.lens[j] - 1)
+                if best is None or err < best[0]:
+                    best = (err, self.edges[self.order[j]])
+        return best
+
+
+def edge_length_index(spec):
+    # Edge length index of the figure, computed once per problem spec.
+    if 'edge_length_index' not in spec:
+        spec['edge_length_index'] = EdgeLengthIndex(spec)
+    return spec['edge_length_index']
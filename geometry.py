@@ -0,0 +1,275 @@
+import random
+from math import gcd
+
+import numpy as np
+
+
+class HoleRaster:
+    # Exact lattice rasterization of the hole polygon (boundary included).
+    #   mask[y - ymin, x - xmin] is True for every integer point inside or on the hole,
+    #   intervals is an (R, 3) array of (y, x_from, x_to) inclusive runs of the mask,
+    #   points is a (P, 2) array of the inside points in row-major order and
+    #   index[y - ymin, x - xmin] is the position of the point in `points` (or -1).
+    def __init__(self, hole):
+        self.hole = np.asarray(hole, dtype=np.int64)
+        self.xmin, self.ymin = (int(v) for v in self.hole.min(axis=0))
+        self.xmax, self.ymax = (int(v) for v in self.hole.max(axis=0))
+        self.width = self.xmax - self.xmin + 1
+        self.height = self.ymax - self.ymin + 1
+
+        self.mask = self._fill_interior() | self._boundary_mask()
+        self.intervals = _mask_runs(self.mask, self.xmin, self.ymin)
+
+        ys, xs = np.nonzero(self.mask)
+        self.points = np.stack([xs + self.xmin, ys + self.ymin], axis=1)
+        self.index = np.full(self.mask.shape, -1, dtype=np.int64)
+        self.index[ys, xs] = np.arange(len(ys))
+
+    def _fill_interior(self):
+        # Even-odd scanline fill on integer rows. Each non-horizontal edge covers
+        # the half-open row range [min y, max y), so every row gets an even number
+        # of crossings and shared vertices are counted exactly once.
+        a = self.hole
+        b = np.roll(self.hole, -1, axis=0)
+        a, b = a[a[:, 1] != b[:, 1]], b[a[:, 1] != b[:, 1]]
+        swap = a[:, 1] > b[:, 1]
+        lo = np.where(swap[:, None], b, a)
+        hi = np.where(swap[:, None], a, b)
+
+        counts = hi[:, 1] - lo[:, 1]
+        edge = np.repeat(np.arange(len(lo)), counts)
+        y = lo[edge, 1] + (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts))
+
+        # x = num / den exactly, den > 0
+        den = hi[edge, 1] - lo[edge, 1]
+        num = lo[edge, 0] * den + (y - lo[edge, 1]) * (hi[edge, 0] - lo[edge, 0])
+        # Correctly rounded division maps equal rationals to equal floats and
+        # the coordinates are small enough to keep distinct ones apart.
+        order = np.lexsort((num / den, y))
+        y, num, den = y[order], num[order], den[order]
+
+        row = y[0::2] - self.ymin
+        x_from = -((-num[0::2]) // den[0::2]) - self.xmin
+        x_to = num[1::2] // den[1::2] - self.xmin
+        keep = x_from <= x_to
+        row, x_from, x_to = row[keep], x_from[keep], x_to[keep]
+
+        diff = np.zeros((self.height, self.width + 1), dtype=np.int32)
+        np.add.at(diff, (row, x_from), 1)
+        np.add.at(diff, (row, x_to + 1), -1)
+        return np.cumsum(diff[:, :-1], axis=1) > 0
+
+    def _boundary_mask(self):
+        mask = np.zeros((self.height, self.width), dtype=bool)
+        pts = lattice_boundary_points(self.hole)
+        mask[pts[:, 1] - self.ymin, pts[:, 0] - self.xmin] = True
+        return mask
+
+    def contains(self, x, y):
+        # Inside or on the boundary, lattice points only.
+        x -= self.xmin
+        y -= self.ymin
+        return 0 <= x < self.width and 0 <= y < self.height and bool(self.mask[y, x])
+
+    def contains_many(self, pts):
+        pts = np.asarray(pts, dtype=np.int64).reshape(-1, 2)
+        x = pts[:, 0] - self.xmin
+        y = pts[:, 1] - self.ymin
+        ok = (x >= 0) & (x < self.width) & (y >= 0) & (y < self.height)
+        res = np.zeros(len(pts), dtype=bool)
+        res[ok] = self.mask[y[ok], x[ok]]
+        return res
+
+    def point_index(self, x, y):
+        x -= self.xmin
+        y -= self.ymin
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return int(self.index[y, x])
+        return -1
+
+
+def lattice_boundary_points(hole):
+    # All integer points lying on the hole edges.
+    hole = np.asarray(hole, dtype=np.int64)
+    res = []
+    for i in range(len(hole)):
+        (x1, y1), (x2, y2) = hole[i - 1], hole[i]
+        g = gcd(int(x2 - x1), int(y2 - y1)) or 1
+        k = np.arange(g + 1)
+        res.append(np.stack([x1 + k * ((x2 - x1) // g), y1 + k * ((y2 - y1) // g)], axis=1))
+    return np.concatenate(res)
+
+
+def _mask_runs(mask, xmin, ymin):
+    padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    d = np.diff(padded, axis=1)
+    start_rows, starts = np.nonzero(d == 1)
+    _, ends = np.nonzero(d == -1)
+    return np.stack([start_rows + ymin, starts + xmin, ends - 1 + xmin], axis=1)
+
+
+def boundary_distances(points, hole, chunk=4096):
+    # Euclidean distance from every point to the closest hole edge.
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    a = np.asarray(hole, dtype=np.float64)
+    b = np.roll(a, -1, axis=0)
+    ab = b - a
+    ab_len2 = np.maximum((ab ** 2).sum(axis=1), 1e-12)
+
+    res = np.empty(len(points))
+    for start in range(0, len(points), chunk):
+        p = points[start:start + chunk, None, :]
+        t = np.clip(((p - a) * ab).sum(axis=2) / ab_len2, 0.0, 1.0)
+        closest = a + t[:, :, None] * ab
+        res[start:start + chunk] = np.sqrt(((p - closest) ** 2).sum(axis=2).min(axis=1))
+    return res
+
+
+def inside_points_by_boundary_distance(raster: HoleRaster):
+    # Inside points closest to the hole boundary first, ties in random order.
+    order = list(range(len(raster.points)))
+    random.shuffle(order)
+    order = np.array(order, dtype=np.int64)
+    dist = boundary_distances(raster.points[order], raster.hole)
+    order = order[np.argsort(dist, kind='stable')]
+    return [tuple(pt) for pt in raster.points[order].tolist()]
+
+
+class HoleIndex:
+    # Exact "segment lies inside or on the hole" predicate.
+    # Hole edges are bucketed into a uniform grid so that a check only looks at
+    # the edges whose bounding boxes share a cell with the segment's bounding box.
+    def __init__(self, hole, raster: HoleRaster = None, cells=16):
+        self.hole = [(int(x), int(y)) for x, y in hole]
+        self.edges = [(self.hole[i - 1], self.hole[i]) for i in range(len(self.hole))]
+        self.raster = raster if raster is not None else HoleRaster(hole)
+        r = self.raster
+        self.cell = max(1, -(-max(r.width, r.height) // cells))
+        self.ncx = (r.width - 1) // self.cell + 1
+        self.ncy = (r.height - 1) // self.cell + 1
+
+        self.grid = [[[] for _ in range(self.ncy)] for _ in range(self.ncx)]
+        # edges overlapping each row of cells, for ray casting
+        self.bands = [[] for _ in range(self.ncy)]
+        for i, ((x1, y1), (x2, y2)) in enumerate(self.edges):
+            cx1, cy1 = self._cell(min(x1, x2), min(y1, y2))
+            cx2, cy2 = self._cell(max(x1, x2), max(y1, y2))
+            for cy in range(cy1, cy2 + 1):
+                self.bands[cy].append(i)
+                for cx in range(cx1, cx2 + 1):
+                    self.grid[cx][cy].append(i)
+
+    def _cell(self, x, y):
+        cx = min(max((x - self.raster.xmin) // self.cell, 0), self.ncx - 1)
+        cy = min(max((y - self.raster.ymin) // self.cell, 0), self.ncy - 1)
+        return int(cx), int(cy)
+
+    def edges_near(self, A, B):
+        # Indices of hole edges that may touch the bounding box of AB
+        cx1, cy1 = self._cell(min(A[0], B[0]), min(A[1], B[1]))
+        cx2, cy2 = self._cell(max(A[0], B[0]), max(A[1], B[1]))
+        if cx1 == cx2 and cy1 == cy2:
+            return self.grid[cx1][cy1]
+        res = set()
+        for cx in range(cx1, cx2 + 1):
+            column = self.grid[cx]
+            for cy in range(cy1, cy2 + 1):
+                res.update(column[cy])
+        return res
+
+    def is_segment_inside(self, A, B):
+        # Check if AB is fully within the hole (touching the boundary is fine)
+        A = (int(A[0]), int(A[1]))
+        B = (int(B[0]), int(B[1]))
+        if not self.raster.contains(*A) or not self.raster.contains(*B):
+            return False
+        if A == B:
+            return True
+
+        contacts = []
+        for i in self.edges_near(A, B):
+            hit = segment_contacts(A, B, *self.edges[i])
+            if hit is None:
+                return False
+            contacts.extend(hit)
+        if not contacts:
+            # both ends inside and the boundary is never met in between
+            return True
+
+        # The boundary is only touched at `contacts`, so every piece in between
+        # is either fully inside or fully outside: test one point of each.
+        # Parameters are exact fractions (num, den); floats are only used to
+        # order them, which is safe for coordinates of this size.
+        ts = sorted(contacts + [(0, 1), (1, 1)], key=lambda t: t[0] / t[1])
+        rx, ry = B[0] - A[0], B[1] - A[1]
+        for (n0, d0), (n1, d1) in zip(ts, ts[1:]):
+            q = 2 * d0 * d1
+            n = n0 * d1 + n1 * d0
+            if not self.contains_point(A[0] * q + n * rx, A[1] * q + n * ry, q):
+                return False
+        return True
+
+    def contains_point(self, x, y, q=1):
+        # Exact inside-or-on test for the point (x / q, y / q), q > 0
+        cy = self._cell(self.raster.xmin, y // q)[1]
+        inside = False
+        for i in self.bands[cy]:
+            (x1, y1), (x2, y2) = self.edges[i]
+            dx, dy = x2 - x1, y2 - y1
+            ox, oy = x - x1 * q, y - y1 * q
+            if (dx * oy == dy * ox
+                    and min(x1, x2) * q <= x <= max(x1, x2) * q
+                    and min(y1, y2) * q <= y <= max(y1, y2) * q):
+                return True
+            if (y1 * q > y) != (y2 * q > y):
+                # is the point left of the edge crossing on this row?
+                if (ox * dy < oy * dx) if dy > 0 else (ox * dy > oy * dx):
+                    inside = not inside
+        return inside
+
+
+def segment_contacts(A, B, C, D):
+    # Points where segment AB meets segment CD, as parameters t = num / den along AB.
+    # Returns None if AB properly crosses CD (the segments' interiors cross at a
+    # single point), otherwise a possibly empty tuple of (num, den) in [0, 1].
+    rx, ry = B[0] - A[0], B[1] - A[1]
+    sx, sy = D[0] - C[0], D[1] - C[1]
+    qx, qy = C[0] - A[0], C[1] - A[1]
+    den = rx * sy - ry * sx
+    if den != 0:
+        tn = qx * sy - qy * sx
+        un = qx * ry - qy * rx
+        if den < 0:
+            den, tn, un = -den, -tn, -un
+        if tn < 0 or tn > den or un < 0 or un > den:
+            return ()
+        if 0 < tn < den and 0 < un < den:
+            return None
+        return ((tn, den),)
+
+    if qx * ry - qy * rx != 0:
+        # parallel
+        return ()
+    # collinear: project CD onto AB
+    rr = rx * rx + ry * ry
+    tc = qx * rx + qy * ry
+    td = (D[0] - A[0]) * rx + (D[1] - A[1]) * ry
+    lo, hi = max(min(tc, td), 0), min(max(tc, td), rr)
+    if lo > hi:
+        return ()
+    return ((lo, rr), (hi, rr))
+
+
+def hole_raster(spec):
+    # Rasterized hole, computed once per problem spec.
+    if 'hole_raster' not in spec:
+        spec['hole_raster'] = HoleRaster(spec['hole'])
+    return spec['hole_raster']
+
+
+def hole_index(spec):
+    # Edge index for exact edge-inside-hole checks, computed once per problem spec.
+    if 'hole_index' not in spec:
+        spec['hole_index'] = HoleIndex(spec['hole'], hole_raster(spec))
+    return spec['hole_index']
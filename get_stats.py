@@ -10,7 +10,7 @@ from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 
 from get_problems import http_error
-from utils import read_problem
+from utils import read_problem, problem_multiplier, problem_score
 
 
 
@@ -44,13 +44,13 @@ def parse_problems_html(html):
         dislikes = td2.string
         min_dislikes = td3.string
         spec = read_problem(problem_id)
-        mult = 1000 * math.log2(len(spec['figure']['vertices']) * len(spec['figure']['edges']) * len(spec['hole']) / 6.0)
+        mult = problem_multiplier(spec)
         max_score = int(math.ceil(mult))
 
         # outer_bonus = spec['bonuses'][0]['problem']
 
         if min_dislikes is not None and dislikes is not None and str.isdigit(dislikes):
-            my_score = int(mult * math.sqrt((int(min_dislikes) + 1) / (int(dislikes) + 1)))
+            my_score = int(problem_score(spec, int(dislikes), int(min_dislikes)))
         else:
             my_score = 0
 
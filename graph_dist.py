@@ -0,0 +1,74 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+
+CACHE_DIR = 'cache/graph_dist'
+
+# float slack on top of epsilon when comparing squared distances
+TOLERANCE = 1e-9
+
+
+def all_pairs_distances(vertices, edges):
+    # (V, V) float64 shortest path lengths over the figure, edges weighted by
+    # their euclidean length; inf between disconnected vertices
+    vertices = np.asarray(vertices, dtype=np.float64)
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    n = len(vertices)
+    dist = np.full((n, n), np.inf)
+    np.fill_diagonal(dist, 0.0)
+    if len(edges):
+        lens = np.sqrt(((vertices[edges[:, 0]] - vertices[edges[:, 1]]) ** 2).sum(axis=1))
+        dist[edges[:, 0], edges[:, 1]] = np.minimum(dist[edges[:, 0], edges[:, 1]], lens)
+        dist[edges[:, 1], edges[:, 0]] = dist[edges[:, 0], edges[:, 1]]
+    for k in range(n):
+        np.minimum(dist, dist[:, k, None] + dist[None, k, :], out=dist)
+    return dist
+
+
+def _figure_key(figure):
+    data = json.dumps([figure['vertices'], figure['edges']], separators=(',', ':'))
+    return hashlib.sha1(data.encode()).hexdigest()[:16]
+
+
+def graph_distances(spec, cache_dir=CACHE_DIR):
+    # all_pairs_distances of the problem figure, kept on the spec and on disk
+    # (keyed by the figure itself, so a changed problem never reads a stale file)
+    if 'graph_dist' in spec:
+        return spec['graph_dist']
+
+    figure = spec['figure']
+    path = os.path.join(cache_dir, _figure_key(figure) + '.npy') if cache_dir else None
+    dist = None
+    if path and os.path.exists(path):
+        try:
+            dist = np.load(path)
+        except (OSError, ValueError):
+            dist = None
+        if dist is not None and dist.shape != (len(figure['vertices']),) * 2:
+            dist = None
+    if dist is None:
+        dist = all_pairs_distances(figure['vertices'], figure['edges'])
+        if path:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp = path + '.tmp.{}.npy'.format(os.getpid())
+            np.save(tmp, dist)
+            os.replace(tmp, path)
+    dist.flags.writeable = False
+    spec['graph_dist'] = dist
+    return dist
+
+
+def reachable_mask(dist, epsilon, origins, positions, node, points):
+    # (K,) bool: points[k] is not farther from any positions[i] than the figure
+    # lets `node` get from origins[i]. Every edge stretches by at most
+    # sqrt(1 + epsilon), so squared distances are bounded by (1 + epsilon) * d^2.
+    points = np.asarray(points, dtype=np.int64).reshape(-1, 2)
+    if len(origins) == 0 or len(points) == 0:
+        return np.ones(len(points), dtype=bool)
+    positions = np.asarray(positions, dtype=np.int64).reshape(-1, 2)
+    limit = dist[np.asarray(origins, dtype=np.int64), node] ** 2 * (1 + epsilon) * (1 + TOLERANCE)
+    d2 = ((points[:, None, :] - positions[None, :, :]) ** 2).sum(axis=2)
+    return (d2 <= limit[None, :]).all(axis=1)
@@ -1,5 +1,6 @@
 
 from utils import read_problem
+from edge_match import dist2, edge_length_index
 import sys
 import json
 
@@ -7,17 +8,6 @@ problem_id = sys.argv[1]
 spec = read_problem(problem_id)
 
 
-def check_distance(spec, orig_dist, new_dist):
-    if abs(1.0 * new_dist / orig_dist - 1) <= spec['epsilon'] / 10**6:
-        return True
-    return False
-
-
-def dist2(pt1, pt2):
-    x1, y1 = pt1
-    x2, y2 = pt2
-    return (x1 - x2) ** 2 + (y1 - y2) ** 2
-
 hole = spec['hole']
 # for i in range(len(hole)):
 #     print (i, (i + 1) % len(hole), dist2(hole[i], hole[(i + 1) % len(hole)]))
@@ -28,15 +18,8 @@ with open('solutions/current', 'rt') as f:
 print ("======")
 
 def find_all_pairs(new_dist):
-    v = spec['figure']['vertices']
-    res = []
-    for (a, b) in sorted(spec['figure']['edges']):
-        orig_dist = dist2(v[a], v[b])
-        if a in current['fixedPoints'] or b in current['fixedPoints']:
-            continue
-        if check_distance(spec, orig_dist, new_dist):
-            res.append(tuple(sorted((a, b))))
-    return res
+    edges = edge_length_index(spec).matching_edges(new_dist, exclude=set(current['fixedPoints']))
+    return [tuple(sorted(e)) for e in edges]
 
 
 for i in range(len(hole)):
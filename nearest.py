@@ -0,0 +1,129 @@
+from math import isqrt
+
+
+class PointGrid:
+    # Grid hash over integer points for exact nearest-neighbour queries.
+    # Points are identified by an index (e.g. the figure vertex id), can be
+    # inserted and removed at any time and may share coordinates.
+    def __init__(self, points=(), cell=None):
+        points = list(points)
+        if cell is None:
+            cell = _cell_size(points)
+        self.cell = cell
+        self.cells = {}
+        self.points = {}
+        self.bounds = None
+        for idx, pt in enumerate(points):
+            self.insert(pt, idx)
+
+    def __len__(self):
+        return len(self.points)
+
+    def insert(self, pt, idx):
+        x, y = int(pt[0]), int(pt[1])
+        key = (x // self.cell, y // self.cell)
+        self.points[idx] = (x, y)
+        self.cells.setdefault(key, {})[idx] = (x, y)
+        if self.bounds is None:
+            self.bounds = [key[0], key[1], key[0], key[1]]
+        else:
+            b = self.bounds
+            b[0], b[1] = min(b[0], key[0]), min(b[1], key[1])
+            b[2], b[3] = max(b[2], key[0]), max(b[3], key[1])
+
+    def remove(self, idx):
+        x, y = self.points.pop(idx)
+        key = (x // self.cell, y // self.cell)
+        cell = self.cells[key]
+        del cell[idx]
+        if not cell:
+            del self.cells[key]
+
+    def move(self, idx, pt):
+        self.remove(idx)
+        self.insert(pt, idx)
+
+    def _ring(self, cx, cy, r):
+        # occupied cells at Chebyshev distance r from (cx, cy)
+        x0, y0, x1, y1 = self.bounds
+        cells = self.cells
+        if r == 0:
+            c = cells.get((cx, cy))
+            if c:
+                yield c
+            return
+        for dx in range(max(-r, x0 - cx), min(r, x1 - cx) + 1):
+            for dy in (-r, r):
+                c = cells.get((cx + dx, cy + dy))
+                if c:
+                    yield c
+        for dy in range(max(-r + 1, y0 - cy), min(r - 1, y1 - cy) + 1):
+            for dx in (-r, r):
+                c = cells.get((cx + dx, cy + dy))
+                if c:
+                    yield c
+
+    def nearest(self, pt):
+        # (squared distance, index) of the closest point, smallest index on ties;
+        # None if the grid is empty
+        if not self.points:
+            return None
+        x, y = pt
+        size = self.cell
+        cx, cy = x // size, y // size
+        x0, y0, x1, y1 = self.bounds
+        max_r = max(cx - x0, x1 - cx, cy - y0, y1 - cy)
+        best = None
+        r = 0
+        while r <= max_r:
+            for c in self._ring(cx, cy, r):
+                for idx, (px, py) in c.items():
+                    d = (px - x) ** 2 + (py - y) ** 2
+                    if best is None or (d, idx) < best:
+                        best = (d, idx)
+            if best is not None:
+                # anything beyond ring r is at least this far away
+                lb = min(x - (cx - r) * size, (cx + r + 1) * size - x,
+                         y - (cy - r) * size, (cy + r + 1) * size - y)
+                if lb * lb > best[0]:
+                    break
+            r += 1
+        return best
+
+    def nearest_many(self, pts):
+        return [self.nearest(pt) for pt in pts]
+
+    def within(self, pt, dist2):
+        # indices of points with squared distance <= dist2
+        if not self.points:
+            return []
+        x, y = pt
+        size = self.cell
+        reach = isqrt(dist2) + 1
+        res = []
+        for kx in range((x - reach) // size, (x + reach) // size + 1):
+            for ky in range((y - reach) // size, (y + reach) // size + 1):
+                c = self.cells.get((kx, ky))
+                if not c:
+                    continue
+                for idx, (px, py) in c.items():
+                    if (px - x) ** 2 + (py - y) ** 2 <= dist2:
+                        res.append(idx)
+        return res
+
+
+def _cell_size(points):
+    # about one point per cell over the bounding box
+    if len(points) < 2:
+        return 8
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    area = (max(xs) - min(xs) + 1) * (max(ys) - min(ys) + 1)
+    return max(1, int(isqrt(area // len(points))))
+
+
+def hole_grid(spec):
+    # Static grid over the hole vertices, computed once per problem spec.
+    if 'hole_grid' not in spec:
+        spec['hole_grid'] = PointGrid(spec['hole'])
+    return spec['hole_grid']
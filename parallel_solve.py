@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# Runs IntegralSolver from every (figure vertex, hole vertex) seed on a process pool,
+# one seed per orbit of the figure and hole symmetries unless --nosymmetry.
+#
+#   python parallel_solve.py <problem_id> --workers=32 --seed_time=60
+
+import json
+import multiprocessing
+import os
+import random
+import signal
+import sys
+import time
+
+from absl import app
+from absl import flags
+
+from utils import read_problem
+from edge_cache import edge_cache
+from candidates import candidate_cache
+from symmetry import seed_representatives
+from solution_log import SolutionLog
+import solve
+
+
+FLAGS = flags.FLAGS
+
+# per-seed timings, kept out of solutions/ where collect_golden looks for solutions
+SEED_STATS_DIR = 'cache/seeds'
+
+flags.DEFINE_integer('workers', os.cpu_count(), 'Number of worker processes.')
+flags.DEFINE_float('seed_time', 60, 'Seconds to spend on one (figure vertex, hole vertex) seed, 0 for no limit.')
+flags.DEFINE_bool('shuffle_seeds', False, 'Try seeds in random order instead of vertex by vertex.')
+flags.DEFINE_bool('worker_logs', False, 'Keep the (very verbose) solver output of the workers.')
+
+
+# per worker process
+_solver = None
+_cancel = None
+
+
+def _init_worker(problem_id, shared_best, cancel, use_domains, edge_cache_mb, candidate_cache_mb, worker_logs,
+                 controller):
+    global _solver, _cancel
+    # the parent handles Ctrl-C and terminates the pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if not worker_logs:
+        sys.stdout = open(os.devnull, 'w')
+
+    spec = read_problem(problem_id)
+    edge_cache(spec, max_bytes=edge_cache_mb * 2**20)
+    candidate_cache(spec, max_bytes=candidate_cache_mb * 2**20)
+    _solver = solve.IntegralSolver(spec=spec, initial_solution=None, problem_id=problem_id, use_domains=use_domains,
+                                   controller=controller)
+    _solver.shared_best = shared_best
+    _solver.cancel = cancel
+    _solver.write_solutions = False
+    _cancel = cancel
+
+
+def _solve_seed(args):
+    vertex, hole_idx, time_limit = args
+    if _cancel.is_set():
+        return vertex, hole_idx, None, None, 0.0, 0, []
+    start = time.time()
+    nodes = _solver.search_nodes
+    score, vertices = _solver.solve_seed(vertex, hole_idx, time_limit)
+    return (vertex, hole_idx, score, vertices, time.time() - start, _solver.search_nodes - nodes,
+            _solver.controller.runs)
+
+
+def parallel_solve(problem_id, workers, seed_time=None, shuffle_seeds=False, use_symmetry=True):
+    # Returns the best score (None if nothing was found); the best solution of
+    # every seed goes to the solution log of the problem and the per-seed
+    # timings to SEED_STATS_DIR/{id}.json.
+    spec = read_problem(problem_id)
+    vertices, holes = range(len(spec['figure']['vertices'])), range(len(spec['hole']))
+    if use_symmetry:
+        vertices, holes = seed_representatives(spec)
+    seeds = [(v, h, seed_time) for v in vertices for h in holes]
+    if shuffle_seeds:
+        random.shuffle(seeds)
+
+    shared_best = multiprocessing.Value('q', -1)
+    cancel = multiprocessing.Event()
+    os.makedirs(SEED_STATS_DIR, exist_ok=True)
+    log = SolutionLog(problem_id)
+
+    best = None
+    results = []
+    start = time.time()
+    pool = multiprocessing.Pool(
+        workers, initializer=_init_worker,
+        initargs=(problem_id, shared_best, cancel, FLAGS.domains, FLAGS.edge_cache_mb,
+                  FLAGS.candidate_cache_mb, FLAGS.worker_logs, solve.controller_from_flags()))
+    try:
+        for vertex, hole_idx, score, vertices, elapsed, nodes, runs in pool.imap_unordered(_solve_seed, seeds):
+            results.append({'vertex': vertex, 'hole': hole_idx, 'score': score,
+                            'time': round(elapsed, 3), 'nodes': nodes, 'runs': runs})
+            if score is not None:
+                log.add(vertices, score, f'seed {vertex} {hole_idx}')
+                if best is None or score < best:
+                    best = score
+                    print(f'[{time.time() - start:.1f}s] NEW BEST {score} from vertex {vertex} at hole {hole_idx}')
+            if cancel.is_set():
+                break
+    except KeyboardInterrupt:
+        print('Interrupted')
+        cancel.set()
+    finally:
+        pool.terminate()
+        pool.join()
+        log.close()
+
+    with open(os.path.join(SEED_STATS_DIR, f'{problem_id}.json'), 'wt') as f:
+        json.dump({'best': best, 'time': round(time.time() - start, 3), 'seeds': results}, f, indent=1)
+    print(f'{len(results)} of {len(seeds)} seeds done in {time.time() - start:.1f}s, best = {best}')
+    print(log)
+    return best
+
+
+def main(argv):
+    problem_id = argv[1]
+    parallel_solve(problem_id, FLAGS.workers, FLAGS.seed_time or None, FLAGS.shuffle_seeds, FLAGS.symmetry)
+
+
+if __name__ == '__main__':
+    app.run(main)
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# Runs one solver over many problems on a process pool. Every problem gets a
+# share of the total time proportional to the score it can still gain:
+#   multiplier - multiplier * sqrt((min_dislikes + 1) / (golden_dislikes + 1))
+#
+#   python run_all.py --solver=integral --total_time=28800 --problems=1-132
+
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import time
+
+from absl import app
+from absl import flags
+
+from utils import read_problem, read_json, problem_multiplier, problem_score
+from dislikes import count_dislikes
+import solve
+import anneal
+
+
+FLAGS = flags.FLAGS
+
+flags.DEFINE_string('solver', 'integral', 'Solver to run: integral, greedy or anneal.')
+flags.DEFINE_string('problems', '1-132', 'Problems to run, e.g. "1-40,55,70-80".')
+flags.DEFINE_integer('workers', os.cpu_count(), 'Number of problems solved at the same time.')
+flags.DEFINE_float('total_time', 3600, 'Wall clock seconds for the whole run.')
+flags.DEFINE_float('min_time', 10, 'Least seconds given to a problem that can still gain score.')
+flags.DEFINE_float('min_gain', 1, 'Skip problems that can gain less score than this.')
+flags.DEFINE_string('stats', 'data/stats.json', 'Stats with the best dislikes of other teams (min_dislikes).')
+flags.DEFINE_string('output', 'solutions/run_all', 'Where the best solution of each problem and summary.json go.')
+flags.DEFINE_bool('worker_logs', False, 'Keep the (very verbose) solver output of the workers.')
+
+
+def parse_problems(s):
+    res = []
+    for part in s.split(','):
+        if '-' in part:
+            lo, hi = part.split('-')
+            res.extend(range(int(lo), int(hi) + 1))
+        elif part:
+            res.append(int(part))
+    return res
+
+
+def golden_dislikes(problem_id):
+    path = f'solutions/golden/{problem_id}'
+    if not os.path.exists(path):
+        return None
+    golden = read_json(path)
+    # an older golden using a bonus is not what we can submit as it is
+    if golden.get('bonuses'):
+        return None
+    spec = read_problem(problem_id)
+    return count_dislikes(spec['hole'], golden['vertices'])
+
+
+def potential_gain(spec, dislikes, min_dislikes):
+    # score still to win on a problem; min_dislikes defaults to a perfect 0
+    mult = problem_multiplier(spec)
+    if dislikes is None:
+        return mult
+    return mult - problem_score(spec, dislikes, min_dislikes or 0)
+
+
+def allocate_budgets(gains, total, min_time):
+    # seconds per problem, proportional to gain, each at least min_time
+    # (problems that would get less are given min_time and the rest re-split)
+    budgets = {}
+    left = dict(gains)
+    while left:
+        share = total / sum(left.values()) if sum(left.values()) else 0
+        small = [p for p, g in left.items() if g * share < min_time]
+        if not small:
+            budgets.update({p: g * share for p, g in left.items()})
+            break
+        for p in small:
+            budgets[p] = min_time
+            total = max(0.0, total - min_time)
+            del left[p]
+    return budgets
+
+
+# Solvers: fn(spec, problem_id, deadline) -> (dislikes, vertices) or (None, None)
+
+def run_integral(spec, problem_id, deadline):
+    solver = solve.IntegralSolver(spec=spec, initial_solution=None, problem_id=problem_id,
+                                  use_symmetry=FLAGS.symmetry, controller=solve.controller_from_flags())
+    solver.write_solutions = False
+    solver.full_solve(deadline)
+    return solver.best_score, solver.best_vertices
+
+
+def run_greedy(spec, problem_id, deadline):
+    inside_points, polygon = solve.compute_inside_points(spec)
+    spec['hole_poly'] = polygon
+    best, best_vertices = None, None
+    while time.time() < deadline:
+        solver = solve.GreedySolver(spec, inside_points)
+        solver.full_solve(deadline)
+        if solver.best_score is not None and (best is None or solver.best_score < best):
+            best = solver.best_score
+            best_vertices = [solver.best_solution[i] for i in range(len(spec['figure']['vertices']))]
+    return best, best_vertices
+
+
+def run_anneal(spec, problem_id, deadline):
+    best, best_pts, _ = anneal.anneal(spec, problem_id, max(0.0, deadline - time.time()))
+    return best, best_pts
+
+
+SOLVERS = {
+    'integral': run_integral,
+    'greedy': run_greedy,
+    'anneal': run_anneal,
+}
+
+
+def _init_worker(worker_logs):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if not worker_logs:
+        sys.stdout = open(os.devnull, 'w')
+
+
+def run_problem(args):
+    solver_name, problem_id, budget, output = args
+    spec = read_problem(problem_id)
+    start = time.time()
+    error = None
+    try:
+        score, vertices = SOLVERS[solver_name](spec, problem_id, start + budget)
+    except Exception as e:
+        score, vertices, error = None, None, repr(e)
+    elapsed = time.time() - start
+    if score is not None:
+        with open(os.path.join(output, str(problem_id)), 'wt') as f:
+            f.write(json.dumps({'vertices': [list(pt) for pt in vertices]}))
+    return problem_id, score, elapsed, error
+
+
+def run_all(solver_name, problems, workers, total_time, min_time, min_gain, stats_path, output):
+    stats = read_json(stats_path) if stats_path and os.path.exists(stats_path) else {}
+    info = {}
+    gains = {}
+    for problem_id in problems:
+        spec = read_problem(problem_id)
+        golden = golden_dislikes(problem_id)
+        min_dislikes = stats.get(str(problem_id), {}).get('min_dislikes')
+        gain = potential_gain(spec, golden, min_dislikes)
+        info[problem_id] = {
+            'problem': problem_id,
+            'multiplier': round(problem_multiplier(spec), 1),
+            'golden': golden,
+            'min_dislikes': min_dislikes,
+            'gain': round(gain, 1),
+        }
+        if gain >= min_gain:
+            gains[problem_id] = gain
+
+    budgets = allocate_budgets(gains, total_time * workers, min_time)
+    # longest first, so the pool does not end waiting for one big problem
+    tasks = sorted(budgets, key=lambda p: -budgets[p])
+    print(f'{len(tasks)} of {len(problems)} problems to run, {len(problems) - len(tasks)} have nothing to gain')
+
+    os.makedirs(output, exist_ok=True)
+    start = time.time()
+    pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(FLAGS.worker_logs,))
+    try:
+        args = [(solver_name, p, budgets[p], output) for p in tasks]
+        for problem_id, score, elapsed, error in pool.imap_unordered(run_problem, args):
+            entry = info[problem_id]
+            golden = entry['golden']
+            entry.update({
+                'solver': solver_name,
+                'budget': round(budgets[problem_id], 1),
+                'time': round(elapsed, 1),
+                'dislikes': score,
+                'improved': score is not None and (golden is None or score < golden),
+                'error': error,
+            })
+            print(f'[{time.time() - start:.0f}s] problem {problem_id}: {score} (golden {golden}) in {elapsed:.0f}s'
+                  + (f' ERROR {error}' if error else ''))
+    except KeyboardInterrupt:
+        print('Interrupted')
+    finally:
+        pool.terminate()
+        pool.join()
+
+    summary = {
+        'solver': solver_name,
+        'time': round(time.time() - start, 1),
+        'problems': [info[p] for p in problems],
+    }
+    with open(os.path.join(output, 'summary.json'), 'wt') as f:
+        json.dump(summary, f, indent=1)
+    improved = [p for p in problems if info[p].get('improved')]
+    print(f'Improved {len(improved)} problems: {improved}')
+    return summary
+
+
+def main(argv):
+    if FLAGS.solver not in SOLVERS:
+        raise app.UsageError(f'unknown solver {FLAGS.solver}, expected one of {sorted(SOLVERS)}')
+    run_all(FLAGS.solver, parse_problems(FLAGS.problems), FLAGS.workers, FLAGS.total_time,
+            FLAGS.min_time, FLAGS.min_gain, FLAGS.stats, FLAGS.output)
+
+
+if __name__ == '__main__':
+    app.run(main)
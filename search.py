@@ -0,0 +1,261 @@
+import time
+
+
+class Trail:
+    # Append-only undo log. Every change to the search state pushes the call
+    # that reverts it, undo(mark) replays them back to an earlier mark.
+    def __init__(self):
+        self.entries = []
+
+    def __len__(self):
+        return len(self.entries)
+
+    def push(self, fn, *args):
+        self.entries.append((fn, args))
+
+    def mark(self):
+        return len(self.entries)
+
+    def undo(self, mark=0):
+        entries = self.entries
+        while len(entries) > mark:
+            fn, args = entries.pop()
+            fn(*args)
+
+
+def luby(i):
+    # i-th term (from 1) of the Luby sequence 1 1 2 1 1 2 4 1 1 2 1 1 2 4 8 ...
+    while True:
+        k = 1
+        while (1 << k) - 1 < i:
+            k += 1
+        if (1 << k) - 1 == i:
+            return 1 << (k - 1)
+        i -= (1 << (k - 1)) - 1
+
+
+RESTART_SCHEDULES = ('none', 'fixed', 'luby', 'geometric')
+
+
+class SearchController:
+    # Budgets and restarts for DepthFirstSearch. The search calls tick() once
+    # per value it tries, the clock is only read every `check_every` ticks.
+    # The search is split into runs: run k gets restart_nodes * luby(k + 1)
+    # ticks ('luby'), restart_nodes * restart_growth ** k ('geometric'),
+    # restart_nodes ('fixed') or no limit ('none') before it is interrupted so
+    # the solver can start over. Running out of the total node or time budget,
+    # or poll() returning True at a clock check, stops the search for good.
+    # With checkpoint_every (seconds) set, checkpoint_due is raised at the
+    # first clock check after that much time since the last one.
+    def __init__(self, time_limit=None, node_limit=None, restart='luby', restart_nodes=1000,
+                 restart_growth=1.5, check_every=256, poll=None, checkpoint_every=None):
+        if restart not in RESTART_SCHEDULES:
+            raise ValueError(f'unknown restart schedule {restart}, expected one of {RESTART_SCHEDULES}')
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.restart = restart
+        self.restart_nodes = restart_nodes
+        self.restart_growth = restart_growth
+        self.check_every = check_every
+        self.poll = poll
+        self.checkpoint_every = checkpoint_every
+        self.begin()
+
+    def begin(self, deadline=None):
+        # start the budgets over; the search stops at `deadline` or after
+        # time_limit seconds, whichever comes first
+        self.start = time.time()
+        self.deadline = deadline
+        if self.time_limit is not None:
+            end = self.start + self.time_limit
+            self.deadline = end if deadline is None else min(deadline, end)
+        self.nodes = 0
+        self.stopped = None
+        self.runs = []
+        self.last_checkpoint = self.start
+        self.checkpoint_due = False
+        self.begin_run()
+
+    def state(self):
+        # counters to carry over to a resumed search
+        return {'nodes': self.nodes, 'run_nodes': self.run_nodes, 'runs': self.runs}
+
+    def restore(self, state):
+        self.nodes = state['nodes']
+        self.runs = state['runs']
+        self.begin_run()
+        self.run_nodes = state['run_nodes']
+        # a search stopped on the very tick that used up its run goes on
+        # with that run over, as it would have without the stop
+        if self.limit is not None and self.run_nodes >= self.limit:
+            self.interrupted = True
+
+    def run_limit(self, k):
+        if self.restart == 'fixed':
+            return self.restart_nodes
+        if self.restart == 'luby':
+            return self.restart_nodes * luby(k + 1)
+        if self.restart == 'geometric':
+            return int(self.restart_nodes * self.restart_growth ** k)
+        return None
+
+    def begin_run(self):
+        self.run_start = time.time()
+        self.run_nodes = 0
+        self.limit = self.run_limit(len(self.runs))
+        self.interrupted = self.stopped is not None
+
+    def end_run(self, **info):
+        # statistics of the run that just ended (plus `info`), and a new run
+        stats = dict(run=len(self.runs), nodes=self.run_nodes,
+                     time=round(time.time() - self.run_start, 3), stopped=self.stopped, **info)
+        self.runs.append(stats)
+        self.begin_run()
+        return stats
+
+    def stop(self, reason):
+        self.stopped = reason
+        self.interrupted = True
+
+    def done(self):
+        return self.stopped is not None
+
+    def tick(self):
+        self.nodes += 1
+        self.run_nodes += 1
+        if self.limit is not None and self.run_nodes >= self.limit:
+            self.interrupted = True
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            self.stop('nodes')
+        elif self.nodes % self.check_every == 0:
+            now = time.time()
+            if self.deadline is not None and now > self.deadline:
+                self.stop('time')
+            elif self.poll is not None and self.poll():
+                self.stop('cancel')
+            if self.checkpoint_every is not None and now - self.last_checkpoint >= self.checkpoint_every:
+                self.last_checkpoint = now
+                self.checkpoint_due = True
+        return self.interrupted
+
+    def summary(self):
+        return (f'{len(self.runs)} runs, {self.nodes} nodes in {time.time() - self.start:.1f}s'
+                + (f', stopped on {self.stopped}' if self.stopped else ''))
+
+
+class DepthFirstSearch:
+    # Iterative depth-first search over a fixed number of placement steps, with
+    # an explicit stack of [values, pos, mark] frames instead of recursion.
+    # Subclasses provide
+    #   candidates(depth)     - values to try at that depth, in order
+    #   assign(depth, value)  - apply a value, pushing its undo onto self.trail;
+    #                           False rejects it (whatever it pushed is undone)
+    #   leaf()                - every step is assigned
+    # and may override visit(depth) (called on entering every node, the root
+    # included) and should_stop(). With a SearchController in
+    # self.controller every value tried is a tick and search() returns as soon
+    # as the controller interrupts the run. checkpoint() is called when the
+    # controller asks for one and when it stops the search for good; position()
+    # is the stack at that point and search(levels, resume=position) goes on
+    # from there, in this or another process. An exception leaves the state as
+    # it was at the time, like recursion would.
+    def __init__(self, controller=None):
+        self.trail = Trail()
+        self.search_nodes = 0
+        self.controller = controller
+        self.stack = []
+        # set while search() replays a resumed position
+        self.replaying = False
+
+    def visit(self, depth):
+        pass
+
+    def should_stop(self):
+        return self.controller is not None and self.controller.interrupted
+
+    def checkpoint(self):
+        pass
+
+    def position(self):
+        # [(values, pos)] per depth: values[pos - 1] is assigned at every depth
+        # but the last, where values[pos] is next; values already done are dropped
+        res = []
+        for depth, (values, pos, _) in enumerate(self.stack):
+            start = pos if depth == len(self.stack) - 1 else pos - 1
+            res.append((values[start:], pos - start))
+        return res
+
+    def search(self, levels, resume=None):
+        trail = self.trail
+        base = trail.mark()
+        controller = self.controller
+
+        if resume is None:
+            self.search_nodes += 1
+            self.visit(0)
+            if levels == 0:
+                self.leaf()
+                return
+            stack = [[self.candidates(0), 0, base]]
+        else:
+            # assign the values on the path of the saved position again
+            stack = []
+            self.replaying = True
+            try:
+                for depth, (values, pos) in enumerate(resume):
+                    stack.append([values, pos, trail.mark()])
+                    if depth + 1 < len(resume) and not self.assign(depth, values[pos - 1]):
+                        trail.undo(base)
+                        raise ValueError(f'saved search position does not replay at depth {depth}')
+            finally:
+                self.replaying = False
+        self.stack = stack
+
+        while stack:
+            frame = stack[-1]
+            # revert the previous value tried here, and everything below it
+            trail.undo(frame[2])
+            values, pos = frame[0], frame[1]
+            if controller is not None and controller.checkpoint_due:
+                controller.checkpoint_due = False
+                self.checkpoint()
+            if self.should_stop():
+                if controller is not None and controller.stopped:
+                    self.checkpoint()
+                break
+            if pos >= len(values):
+                stack.pop()
+                continue
+            frame[1] = pos + 1
+            depth = len(stack) - 1
+            if controller is not None:
+                controller.tick()
+            if not self.assign(depth, values[pos]):
+                continue
+            self.search_nodes += 1
+            self.visit(depth + 1)
+            if depth + 1 == levels:
+                self.leaf()
+            else:
+                stack.append([self.candidates(depth + 1), 0, trail.mark()])
+
+        trail.undo(base)
+        self.stack = []
+
+
+def edge_sequence(edges, placed):
+    # Order in which vertices get added when growing the figure from `placed`
+    # over its edges: (a, b) pairs, b is the new vertex and a an earlier one.
+    # Each step takes the first edge in `edges` with exactly one end added.
+    placed = set(placed)
+    sequence = []
+    while True:
+        for a, b in edges:
+            if b in placed:
+                a, b = b, a
+            if a in placed and b not in placed:
+                break
+        else:
+            return sequence
+        sequence.append((a, b))
+        placed.add(b)
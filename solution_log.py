@@ -0,0 +1,192 @@
+import atexit
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+
+from utils import read_json
+
+
+LOG_DIR = 'solutions/log'
+QUEUE_SIZE = 1024
+
+
+def log_path(problem_id, root=LOG_DIR):
+    return os.path.join(root, f'{problem_id}.jsonl')
+
+
+def best_path(problem_id, root=LOG_DIR):
+    return os.path.join(root, f'{problem_id}.best.json')
+
+
+def _vertices_json(vertices):
+    return json.dumps([[int(x), int(y)] for x, y in vertices], separators=(',', ':'))
+
+
+def bonus_key(bonuses):
+    # which best pointer a solution counts for: 'none' without a bonus,
+    # otherwise the bonus and the problem it comes from, as in 'GLOBALIST:64'
+    if not bonuses:
+        return 'none'
+    return ','.join('{}:{}'.format(b.get('bonus'), b.get('problem')) for b in bonuses)
+
+
+def _key(vertices_json, bonuses=None):
+    data = vertices_json if not bonuses else vertices_json + json.dumps(bonuses, sort_keys=True)
+    return hashlib.sha1(data.encode()).digest()[:12]
+
+
+class SolutionLog:
+    # Append-only log of the solutions found for one problem: <id>.jsonl with
+    # one {"dislikes", "vertices", "source", "time"} per line ("bonuses" too
+    # for solutions using one, as in the submitted format), and <id>.best.json
+    # with the dislikes and byte offset of the best line for every bonus_key
+    # (strict solutions under 'none'), so a bonus solution we cannot submit
+    # never hides the best strict one. add() only queues the
+    # solution; a background thread drops vertex arrays already in the log and
+    # does the writing, so the search never waits on the disk unless the
+    # queue is full. Only one SolutionLog per problem should be open at a time.
+    def __init__(self, problem_id, root=LOG_DIR, queue_size=QUEUE_SIZE):
+        self.problem_id = problem_id
+        self.root = root
+        self.path = log_path(problem_id, root)
+        self.best_path = best_path(problem_id, root)
+        self.keys = set()
+        # bonus_key -> (dislikes, offset)
+        self.bests = {}
+        self.written = 0
+        self.duplicates = 0
+        os.makedirs(root, exist_ok=True)
+        self._scan()
+
+        self.queue = queue.Queue(queue_size)
+        self.closed = False
+        self.thread = threading.Thread(target=self._writer, name=f'solution-log-{problem_id}', daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def _scan(self):
+        # keys and best entry of an existing log; a last line cut short by a
+        # killed writer is dropped
+        if not os.path.exists(self.path):
+            return
+        offset = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    offset += len(line)
+                    continue
+                self.keys.add(_key(_vertices_json(entry['vertices']), entry.get('bonuses')))
+                self._update_best(entry.get('bonuses'), entry['dislikes'], offset)
+                offset += len(line)
+        if offset < os.path.getsize(self.path):
+            with open(self.path, 'r+b') as f:
+                f.truncate(offset)
+        if self.bests:
+            self._write_best()
+
+    def add(self, vertices, dislikes, source='', bonuses=None):
+        self.queue.put((list(vertices), int(dislikes), source, time.time(), bonuses))
+
+    def _writer(self):
+        with open(self.path, 'ab') as f:
+            while True:
+                item = self.queue.get()
+                try:
+                    if item is None:
+                        return
+                    self._write(f, *item)
+                finally:
+                    self.queue.task_done()
+
+    def _write(self, f, vertices, dislikes, source, timestamp, bonuses):
+        vertices_json = _vertices_json(vertices)
+        key = _key(vertices_json, bonuses)
+        if key in self.keys:
+            self.duplicates += 1
+            return
+        self.keys.add(key)
+        line = '{{"dislikes":{},"vertices":{},"source":{},"time":{:.3f}{}}}\n'.format(
+            dislikes, vertices_json, json.dumps(source), timestamp,
+            ',"bonuses":' + json.dumps(bonuses, separators=(',', ':')) if bonuses else '')
+        offset = f.tell()
+        f.write(line.encode())
+        f.flush()
+        self.written += 1
+        if self._update_best(bonuses, dislikes, offset):
+            self._write_best()
+
+    def _update_best(self, bonuses, dislikes, offset):
+        key = bonus_key(bonuses)
+        if key in self.bests and self.bests[key][0] <= dislikes:
+            return False
+        self.bests[key] = (dislikes, offset)
+        return True
+
+    @property
+    def best(self):
+        # best strict dislikes
+        return self.bests.get('none', (None,))[0]
+
+    def _write_best(self):
+        tmp = '{}.tmp.{}'.format(self.best_path, os.getpid())
+        with open(tmp, 'wt') as f:
+            json.dump({key: {'dislikes': d, 'offset': o} for key, (d, o) in self.bests.items()}, f)
+        os.replace(tmp, self.best_path)
+
+    def flush(self):
+        # wait until everything added so far is written
+        self.queue.join()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(None)
+        self.thread.join()
+
+    def __str__(self):
+        bests = ', '.join(f'{key} {d}' for key, (d, _) in sorted(self.bests.items()))
+        return f'SolutionLog({self.path}: {self.written} written, {self.duplicates} duplicates, best {bests or None})'
+
+
+def read_bests(problem_id, root=LOG_DIR):
+    # bonus_key -> best entry of the log of a problem ({"dislikes",
+    # "vertices", ...}); one seek per entry, no scan
+    try:
+        pointers = read_json(best_path(problem_id, root))
+        res = {}
+        with open(log_path(problem_id, root), 'rb') as f:
+            for key, pointer in pointers.items():
+                f.seek(pointer['offset'])
+                res[key] = json.loads(f.readline())
+        return res
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return {}
+
+
+def read_best(problem_id, root=LOG_DIR):
+    # best strict entry of the log of a problem, None if there is none
+    return read_bests(problem_id, root).get('none')
+
+
+def read_log(problem_id, root=LOG_DIR):
+    # every complete entry of the log of a problem
+    path = log_path(problem_id, root)
+    if not os.path.exists(path):
+        return []
+    entries = []
+    with open(path, 'rb') as f:
+        for line in f:
+            if line.endswith(b'\n'):
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    pass
+    return entries
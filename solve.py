@@ -8,13 +8,26 @@ import copy
 import random
 import time
 import math
-import itertools
+
+import numpy as np
 
 import os.path
 
 from shapely.geometry import Point, Polygon
 
 from utils import read_problem
+from geometry import hole_raster, inside_points_by_boundary_distance
+from edge_cache import edge_cache
+from dislikes import DislikesTracker, count_dislikes as count_dislikes_of, reach_lower_bound
+from candidates import RingTable, as_points, candidate_cache, intersect_rings
+from domains import Domains, VertexOrder
+from bonuses import BONUSES, BREAK_A_LEG, RELAXING, BonusBudget, bonus_entry, break_leg
+from search import DepthFirstSearch, RESTART_SCHEDULES, SearchController, edge_sequence
+from solution_log import SolutionLog
+from checkpoint import (checkpoint_path, decode_frames, decode_rng, encode_frames, encode_rng, load_checkpoint,
+                        save_checkpoint, CHECKPOINT_DIR)
+from graph_dist import graph_distances, reachable_mask
+from symmetry import seed_representatives
 from get_problems import submit_solution
 
 from networkx import nx
@@ -26,11 +39,50 @@ from absl import flags
 FLAGS = flags.FLAGS
 
 flags.DEFINE_string('init_path', None, 'Path to a solution file to seed initial vertices.')
+flags.DEFINE_integer('edge_cache_mb', 64, 'Memory cap for the edge validity cache, in MB.')
+flags.DEFINE_integer('candidate_cache_mb', 256, 'Memory cap for the candidate points cache, in MB.')
+flags.DEFINE_bool('domains', True, 'Propagate bitset domains of candidate points in IntegralSolver.')
+flags.DEFINE_bool('symmetry', True, 'Start searches only from one seed per orbit of figure and hole symmetries.')
+flags.DEFINE_float('time_limit', 0, 'Seconds for the whole search, 0 for the solver default.')
+flags.DEFINE_integer('node_limit', 0, 'Values to try in the whole search, 0 for no limit.')
+flags.DEFINE_enum('restarts', 'luby', RESTART_SCHEDULES, 'Restart schedule: node budget of every run of the search.')
+flags.DEFINE_integer('restart_nodes', 1000, 'Node budget unit of the restart schedule.')
+flags.DEFINE_float('restart_growth', 1.5, 'Growth of the budget per run with --restarts=geometric.')
+flags.DEFINE_integer('check_every', 256, 'Read the clock every that many nodes.')
+flags.DEFINE_float('checkpoint_every', 10, 'Seconds between snapshots of the IntegralSolver search, 0 for none.')
+flags.DEFINE_string('checkpoint_dir', CHECKPOINT_DIR, 'Where the search snapshots go, one file per problem.')
+flags.DEFINE_bool('resume', False, 'Go on from the snapshot of an earlier run of the problem.')
+flags.DEFINE_enum('bonus', None, BONUSES, 'Bonus the IntegralSolver solutions use. Domains are off with '
+                  'GLOBALIST, SUPERFLEX and WALLHACK, they only know the strict rules.')
+flags.DEFINE_integer('bonus_from', None, 'Problem the bonus is unlocked on, by default the first one offering it.')
+flags.DEFINE_list('break_leg', None, 'Edge a,b to break with --bonus=BREAK_A_LEG, by default the longest one.')
 
 
 TIMEOUT = 60 # seconds
 eps = 1e-6
 
+# the dislikes bound looks at the union of the open domains only up to this many points
+DOMAIN_BOUND_POINTS = 4096
+# IntegralSolver bounds the dislikes only from this many placed vertices on,
+# closer to the root the bound hardly ever prunes
+BOUND_MIN_PLACED = 3
+
+# relative noise on the value order of a run that starts over from a seed already tried
+RESTART_NOISE = 0.1
+
+# node budget of Solver for one (figure vertex, hole vertex) start; its
+# nodes scan every inside point, so the clock is read more often too
+SOLVER_START_NODES = 200
+SOLVER_CHECK_EVERY = 16
+
+
+def controller_from_flags(default_time_limit=None):
+    return SearchController(
+        time_limit=FLAGS.time_limit or default_time_limit, node_limit=FLAGS.node_limit or None,
+        restart=FLAGS.restarts, restart_nodes=FLAGS.restart_nodes,
+        restart_growth=FLAGS.restart_growth, check_every=FLAGS.check_every,
+        checkpoint_every=FLAGS.checkpoint_every or None)
+
 
 def is_inside(polygon: Polygon, x, y, eps = 0):
     if eps == 0:
@@ -86,14 +138,12 @@ def is_edge_not_overlapping_hole(spec, A: Tuple, B: Tuple):
     return True
 
 def is_edge_inside_fast(spec, A: Tuple, B: Tuple):
-    # Check if 9 AB midpoints are all within the hole
-    return all(is_inside(spec['hole_poly'], *point_average(A, B, a), eps) for a in (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9))
+    # The exact check is cheap enough to be used everywhere
+    return is_edge_inside(spec, A, B)
 
 def is_edge_inside(spec, A: Tuple, B: Tuple):
     # Check if AB is fully within the hole
-    if not all(is_inside(spec['hole_poly'], *point_average(A, B, a), eps) for a in (0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1)):
-        return False
-    return is_edge_not_overlapping_hole(spec, A, B)
+    return edge_cache(spec).is_edge_inside(A, B)
 
 def is_edge_points_inside_fast(inside_points_set, A: Tuple, B: Tuple):
     for a in [0.5, 0.25, 0.75, 0.1, 0.2, 0.3, 0.4, 0.6, 0.7, 0.8, 0.9]:
@@ -103,40 +153,14 @@ def is_edge_points_inside_fast(inside_points_set, A: Tuple, B: Tuple):
     return True
 
 def compute_inside_points(spec):
-    res = set()
-
-    # compute bounding box
-    first_pt = spec['hole'][0]
-    xmax = xmin = first_pt[0]
-    ymax = ymin = first_pt[1]
-
-    for pt in spec['hole']:
-        x, y = pt
-        xmax = max(xmax, x)
-        ymax = max(ymax, y)
-
-        xmin = min(xmin, x)
-        ymin = min(ymin, y)
-    
-    polygon = Polygon(spec['hole'])
-    for x in range(xmin, xmax + 1):
-        for y in range(ymin, ymax + 1):
-            if is_inside(polygon, x, y):
-                res.add((x, y))
-    res = list(res)
-    random.shuffle(res)
-    boundary = polygon.boundary
-    res.sort(key=lambda p: boundary.distance(Point(p)))
-    return res, polygon
+    # Lattice points inside or on the hole, closest to the boundary first
+    res = inside_points_by_boundary_distance(hole_raster(spec))
+    return res, Polygon(spec['hole'])
 
 
 
 def count_dislikes_impl(spec, values):
-    total_dislikes = 0
-    for hole_pt in spec['hole']:
-        min_dist = min(dist2(hole_pt, pt) for pt in values)
-        total_dislikes += min_dist
-    return total_dislikes
+    return count_dislikes_of(spec['hole'], values)
 
 
 def count_dislikes(spec, solution):
@@ -183,10 +207,6 @@ def check_full_solution(spec, solution):
     return True
 
 
-class TimeoutException(Exception):
-    pass
-
-
 def compute_edge_lens(spec):
     hole = spec["hole"]
     hole_edges = [dist2(hole[i], hole[i-1]) for i in range(1, len(hole))]
@@ -206,8 +226,11 @@ def compute_edge_lens(spec):
             fig_vtx_lens[e[a]].add(fig_edges_min_max[i])
     figure["vtx_min_max_lens"] = fig_vtx_lens
 
-class Solver():
-    def __init__(self, spec, len_matching=False):
+class Solver(DepthFirstSearch):
+    def __init__(self, spec, len_matching=False, use_symmetry=True, controller=None):
+        # by default TIMEOUT seconds in all, SOLVER_START_NODES per start
+        DepthFirstSearch.__init__(self, controller or SearchController(
+            time_limit=TIMEOUT, restart='fixed', restart_nodes=SOLVER_START_NODES, check_every=SOLVER_CHECK_EVERY))
         self.spec = spec
         inside_points, polygon = compute_inside_points(spec)
         self.inside_points = inside_points
@@ -226,60 +249,47 @@ class Solver():
         self.len_matching = len_matching
         if len_matching:
             compute_edge_lens(spec)
+        self.use_symmetry = use_symmetry
+        self.shortest_distances = graph_distances(spec)
+        self.pruned = 0
 
-    def try_solve(self, solution):
-        spec = self.spec
-
-        now = time.time()
-        delta = now - self.start
-        if delta > TIMEOUT:
-            print ('timeout after {} seconds'.format(delta))
-            raise TimeoutException()
-
-        # find next edge to add
-        edge_to_add = None
-        for edge in spec['figure']['edges']:
-            a, b = edge
-            # swap to always treat as a in solution
-            if b in solution:
-                a, b = b, a
-            if a not in solution:
-                continue
-            assert (a in solution)
-            if b in solution:
-                continue
-            assert (b not in solution)
-            edge_to_add = a, b
-            break
-            
-        # nothing to add - this is final answer
-        if edge_to_add is None:
-            score = count_dislikes(spec, solution)
-            if self.best_score is None or score < self.best_score:
-                self.best_score = score
-                self.best_solution = copy.copy(solution)
-                print ("Found better score = {}".format(
-                    score,
-                ))
-            return
-
+    def candidates(self, depth):
         # find next possible point for b
-        orig_dist = dist2(spec['figure']['vertices'][a], spec['figure']['vertices'][b])    
-        for pt in self.inside_points:
-            if check_partial_solution(spec, solution, b, pt):
-                solution[b] = pt
-                self.try_solve(solution)
-                if time.time() - self.start_fig_vtx > 2: # 2 sec timeout per start fig vtx
-                    return False
-                # otherwise restore previous state
-                if self.best_score == 0: break
-                del solution[b]
-        return False
+        a, b = self.sequence[depth]
+        return [pt for pt in self.inside_points if check_partial_solution(self.spec, self.solution, b, pt)]
+
+    def assign(self, depth, pt):
+        a, b = self.sequence[depth]
+        self.solution[b] = pt
+        self.trail.push(self.solution.pop, b)
+        self.dislikes.place(pt)
+        self.trail.push(self.dislikes.unplace, pt)
+        if self.best_score is not None:
+            # branch and bound: nothing below can beat the best solution
+            placed = list(self.solution)
+            reach = reach_lower_bound(
+                self.spec['hole'], self.shortest_distances, self.spec['epsilon'] / 1000000.0,
+                placed, [self.solution[v] for v in placed], [v for _, v in self.sequence[depth + 1:]])
+            if self.dislikes.bounded_score(reach) >= self.best_score:
+                self.pruned += 1
+                return False
+        return True
 
-    def full_solve(self):
-        # start the timer
-        self.start = time.time()
-        
+    def leaf(self):
+        # nothing to add - this is final answer
+        score = count_dislikes(self.spec, self.solution)
+        if self.best_score is None or score < self.best_score:
+            self.best_score = score
+            self.best_solution = copy.copy(self.solution)
+            print ("Found better score = {}".format(
+                score,
+            ))
+        if score == 0:
+            self.controller.stop('solved')
+
+    def full_solve(self, deadline=None):
+        # every (figure vertex, hole vertex) start is one run of the controller
+        self.controller.begin(deadline)
 
         spec = self.spec
         num_fig_vtx = len(spec['figure']['vertices'])
@@ -295,28 +305,35 @@ class Solver():
         # self.try_solve(solution)
 
         hole_indices = list(range(len(spec['hole'])))
+        fig_vtcs_all = list(range(num_fig_vtx))
+        if self.use_symmetry:
+            # symmetric copies of a seed lead to the same embeddings
+            fig_vtcs_all, hole_indices = seed_representatives(spec)
         random.shuffle(hole_indices)
         for hole_idx in hole_indices:
             first_hole_pt = spec['hole'][hole_idx]
-            fig_vtcs = list(range(num_fig_vtx))
+            fig_vtcs = list(fig_vtcs_all)
             random.shuffle(fig_vtcs)
             for fig_vtx in fig_vtcs:
                 if self.len_matching:
                     if (not any(mi<=spec["hole_edge_lens"][hole_idx]<=ma for mi, ma in spec["figure"]["vtx_min_max_lens"][fig_vtx])
                     and not any(mi<=spec["hole_edge_lens"][hole_idx-1]<=ma for mi, ma in spec["figure"]["vtx_min_max_lens"][fig_vtx])):
                         continue
-                if self.best_score == 0:
+                if self.controller.done():
                     break
-                self.start_fig_vtx = time.time()
                 print ('Trying connecting figure vtx={} to hole vtx {}'.format(fig_vtx, hole_idx))
-                solution = {fig_vtx: tuple(first_hole_pt)}
+                self.solution = {fig_vtx: tuple(first_hole_pt)}
+                self.dislikes = DislikesTracker(spec['hole'], [first_hole_pt])
+                self.sequence = edge_sequence(spec['figure']['edges'], self.solution)
 
-                self.try_solve(solution)
+                self.search(len(self.sequence))
+                self.controller.end_run(seed=(fig_vtx, hole_idx), best=self.best_score)
+        print (self.controller.summary())
 
 
-
-class GreedySolver:
-    def __init__(self, spec, inside_points):
+class GreedySolver(DepthFirstSearch):
+    def __init__(self, spec, inside_points, controller=None):
+        DepthFirstSearch.__init__(self, controller or SearchController(time_limit=TIMEOUT, restart='none'))
         self.spec = spec
         self.inside_points = inside_points
         self.best_score = None
@@ -332,77 +349,57 @@ class GreedySolver:
             adj[e[1]].append(e[0])
         spec['figure']['adj'] = adj
 
-    def full_solve(self):
-        # start the timer
-        self.start = time.time()
+    def full_solve(self, deadline=None):
+        self.controller.begin(deadline)
 
         inside_pt = random.choice(self.inside_points)
         total_points = len(self.spec['figure']['vertices'])
         start_idx = random.choice(range(total_points))
 
-        solution = {start_idx: inside_pt}
-        self.try_solve(solution)
-
-    def try_solve(self, solution):
-        spec = self.spec
-
-        now = time.time()
-        delta = now - self.start
-        if delta > TIMEOUT:
-            print ('timeout after {} seconds'.format(delta))
-            raise TimeoutException()
-
-        # find next edge to add
-        edge_to_add = None
-        for edge in spec['figure']['edges']:
-            a, b = edge
-            # swap to always treat as a in solution
-            if b in solution:
-                a, b = b, a
-            if a not in solution:
-                continue
-            assert (a in solution)
-            if b in solution:
-                continue
-            assert (b not in solution)
-            edge_to_add = a, b
-            break
-            
-        # nothing to add - this is final answer
-        if edge_to_add is None:
-            score = count_dislikes(spec, solution)
-            if self.best_score is None or score < self.best_score:
-                self.best_score = score
-                self.best_solution = copy.copy(solution)
-                print ("Found better score = {}, best solution = {}, solution = {}".format(
-                    score, self.best_solution, solution
-                ))
-            return
-
-        # find next possible point for b
-        orig_dist = dist2(spec['figure']['vertices'][a], spec['figure']['vertices'][b])
+        self.solution = {start_idx: inside_pt}
+        self.dislikes = DislikesTracker(self.spec['hole'], [inside_pt])
+        self.sequence = edge_sequence(self.spec['figure']['edges'], self.solution)
+        self.search(len(self.sequence))
+        if self.controller.stopped:
+            print (self.controller.summary())
+
+    def candidates(self, depth):
+        # only the point for b that adds the fewest dislikes
+        a, b = self.sequence[depth]
+        solution = self.solution
         min_edge_score = None
         min_pt = None
 
-        for pt in self.inside_points:
-            if check_partial_solution(spec, solution, b, pt):
-                solution[b] = pt
-                score = count_dislikes(spec, solution)
-                if min_edge_score is None or score < min_edge_score:
-                    min_edge_score = score
-                    min_pt = pt
-                del solution[b]
+        viable_points = [pt for pt in self.inside_points if check_partial_solution(self.spec, solution, b, pt)]
+        if viable_points:
+            scores = self.dislikes.score_candidates(viable_points)
+            best = int(scores.argmin())
+            min_edge_score = int(scores[best])
+            min_pt = viable_points[best]
 
         self.partial_solution = copy.copy(solution)
         if min_pt is None:
-            print ('At nodes={} -> nothing found'.format(len(solution)))                   
-        else:
-            print ('At nodes={} -> score = {}, solution = {}'.format(len(solution), min_edge_score, solution))
-            solution[b] = min_pt
-            self.try_solve(solution)
+            print ('At nodes={} -> nothing found'.format(len(solution)))
+            return []
+        print ('At nodes={} -> score = {}, solution = {}'.format(len(solution), min_edge_score, solution))
+        return [min_pt]
+
+    def assign(self, depth, pt):
+        a, b = self.sequence[depth]
+        self.solution[b] = pt
+        self.dislikes.place(pt)
+        self.trail.push(self.solution.pop, b)
+        self.trail.push(self.dislikes.unplace, pt)
+        return True
 
-class TrySomethingNew(Exception):
-    pass
+    def leaf(self):
+        score = self.dislikes.score()
+        if self.best_score is None or score < self.best_score:
+            self.best_score = score
+            self.best_solution = copy.copy(self.solution)
+            print ("Found better score = {}, best solution = {}, solution = {}".format(
+                score, self.best_solution, self.solution
+            ))
 
 class Solution:
     def __init__(self, spec, num_vertices):
@@ -410,23 +407,31 @@ class Solution:
         self.num_vertices = num_vertices
         self.placed = set()
         self.placement_order = []
-        self.next = 0
         self.hole = [tuple(v) for v in spec["hole"]]
         self.hole_dict = {v:i for i, v in enumerate(self.hole)}
         self.hole_status = {i:False for i in range(len(self.hole))}
+        self.dislikes = DislikesTracker(self.hole)
 
     def place(self, i, pt):
         print(f"Placing {i} at {pt} (already placed {len(self.placed)})")
         self.vertices[i] = pt
         self.placed.add(i)
+        self.dislikes.place(pt)
 
         if pt in self.hole_dict:
             self.hole_status[self.hole_dict[pt]] = True
 
     def unplace(self, i, pt):
+        self.vertices[i] = None
+        self.placed.discard(i)
+        self.dislikes.unplace(pt)
         if pt in self.hole_dict:
             self.hole_status[self.hole_dict[pt]] = False            
 
+    def reset_dislikes(self):
+        # after `placed`/`vertices` were changed directly
+        self.dislikes = DislikesTracker(self.hole, [self.vertices[i] for i in self.placed])
+
     def print(self):
         result = [list(pt) if pt is not None else [0,0] for pt in self.vertices]
         result_json = f"{{\"vertices\":{result}}}"
@@ -440,24 +445,10 @@ class Solution:
         with open(file_name, 'wt') as f:
             f.write(result_json)
 
-    def stash(self):
-        return {
-            "placed": set(self.placed),
-            "next": self.next,
-            "hole_status": dict(self.hole_status),
-            "vertices": list(self.vertices),
-        }
-
-    def recover_stash(self, s):
-        self.placed = s["placed"]
-        self.next = s["next"]
-        self.hole_status = s["hole_status"]
-        self.vertices = s["vertices"]
-
-solution_num = 0
-
-class IntegralSolver:
-    def __init__(self, spec, initial_solution, problem_id):
+class IntegralSolver(DepthFirstSearch):
+    def __init__(self, spec, initial_solution, problem_id, use_domains=True, use_symmetry=True, controller=None,
+                 bonus=None):
+        DepthFirstSearch.__init__(self, controller or SearchController())
         self.spec = spec
         self.problem_id = problem_id
 
@@ -477,12 +468,30 @@ class IntegralSolver:
                 else:
                     initial_solution.vertices[vi] = None
             initial_solution.placed = new_placed
+            initial_solution.reset_dislikes()
 
         spec['hole_poly'] = polygon
+        self.candidate_cache = candidate_cache(spec)
+        self.rings = RingTable(spec)
         self.best_score = None
         self.best_solution = None
-        self.num_solutions_after_best = 0
+        self.best_vertices = None
         self.timer = None
+        self.pruned = 0
+        # value order noise of the current run, see RESTART_NOISE
+        self.noise = 0.0
+        self.rng = random.Random()
+
+        # Set by parallel_solve.py: a multiprocessing Value with the best score
+        # of all workers (-1 until there is one) and an Event to stop every
+        # worker (checked along with the clock); the parent logs the solutions.
+        self.shared_best = None
+        self.cancel = None
+        self.controller.poll = self.cancelled
+        self.write_solutions = True
+        # snapshots of the search for full_solve(resume=...) go there, see checkpoint()
+        self.checkpoint_path = None
+        self.solution_log = None
 
         figure = spec["figure"]
         edges, vtx = figure["edges"], figure["vertices"]
@@ -491,6 +500,17 @@ class IntegralSolver:
         print(f"self.vertices = {self.vertices}")
         self.epsilon = spec["epsilon"] / 1000000.0
 
+        # `bonus` is the "bonuses" entry the solutions carry (for BREAK_A_LEG
+        # the spec is the broken one already); the other bonuses loosen the
+        # rules, and what is left of them is tracked along the search
+        self.bonus = bonus
+        self.budget = None
+        self.reach_epsilon = self.epsilon
+        if bonus is not None and bonus['bonus'] in RELAXING:
+            self.budget = BonusBudget(spec, bonus['bonus'])
+            self.reach_epsilon = self.budget.reach_epsilon(self.epsilon)
+        self.raster = hole_raster(spec)
+
         # adjacency lists
         graph = nx.Graph()
         for e in spec['figure']['edges']:
@@ -500,29 +520,55 @@ class IntegralSolver:
         self.initial_points = [
             tuple(pt) for pt in spec['hole']
         ] # + self.inside_points
+        self.start_vertices = list(range(len(self.vertices)))
+        if use_symmetry:
+            # one start vertex per figure orbit, one first position per hole orbit
+            self.start_vertices, hole_reps = seed_representatives(spec)
+            self.initial_points = [tuple(spec['hole'][h]) for h in hole_reps]
         # print(f"initial_points = {self.initial_points}")
         # exit()
 
-        self.shortest_distances = nx.floyd_warshall(graph, "dist")
-
-        self.start_times = {}
-        self.current_depth = 0
+        self.shortest_distances = graph_distances(spec)
+
+        self.domains = None
+        self.vertex_order = None
+        if use_domains and self.budget is not None:
+            print(f"Not using domains with {bonus['bonus']}, they only know the strict rules")
+            use_domains = False
+        if use_domains:
+            self.domains = Domains(spec, {v: list(graph[v]) for v in graph}, self.epsilon)
+            if initial_solution:
+                for v in sorted(initial_solution.placed):
+                    if not self.domains.assign(v, initial_solution.vertices[v]):
+                        print(f"Initial position of {v} contradicts the placed neighbours, not using domains")
+                        self.domains = None
+                        break
+        if self.budget is not None and initial_solution:
+            placed = set()
+            for v in sorted(initial_solution.placed):
+                pt = initial_solution.vertices[v]
+                edges = [(u, graph[u][v]["dist"], dist2(initial_solution.vertices[u], pt)) for u in graph[v] if u in placed]
+                state = self.budget.charge(v, self.raster.contains(*pt), edges)
+                if state is None:
+                    raise ValueError(f"Initial position of {v} does not fit {bonus['bonus']}")
+                self.budget.take(state)
+                placed.add(v)
+            print(f"initial solution: {self.budget}")
 
 
     def is_point_reachable(self, solution, origin, node, pt):
-        origin_v = solution.vertices[origin]
-        new_dist = dist2(origin_v, pt)
-        max_dist = self.shortest_distances[origin][node]
-        if new_dist > max_dist * (1 + self.epsilon):
-            # print(f"Node {node} at {pt} got too far from {origin} at {origin_v} ({new_dist} vs {max_dist})")
-            return False
-        return True
+        return self.is_point_reachable_from_points(solution, [origin], node, pt)
 
     def is_point_reachable_from_points(self, solution, origin_points, node, pt):
-        for origin in origin_points:
-            if not self.is_point_reachable(solution, origin, node, pt):
-                return False
-        return True
+        return bool(self.reachable_mask(solution, origin_points, node, [pt])[0])
+
+    def reachable_mask(self, solution, origin_points, node, points):
+        # node can't get farther from a placed vertex than the figure path between them
+        origins = list(origin_points)
+        if self.reach_epsilon is None:
+            return np.ones(len(points), dtype=bool)
+        return reachable_mask(self.shortest_distances, self.reach_epsilon, origins,
+                              [solution.vertices[o] for o in origins], node, points)
 
     def get_placement_order_by_placed_neibs(self, i):
         if self.initial_solution:
@@ -553,172 +599,422 @@ class IntegralSolver:
         return result
 
 
-    def full_solve(self):
+    def start(self, solution, first=None):
+        # Search state for one start (`first` placed first, None when the
+        # solution already has placed vertices). With domains the rest of the
+        # placement order is filled in during the search, most constrained
+        # vertex first; without them it is fixed here by placed neighbours and
+        # every step gets its placed neighbours and the edge lengths to them.
+        self.solution = solution
+        self.placed_mask = np.zeros(solution.num_vertices, dtype=bool)
+        self.placed_mask[list(solution.placed)] = True
+        if self.domains is not None:
+            self.vertex_order = VertexOrder(self.domains, solution.placed)
+            fixed = [] if first is None else [first]
+            solution.placement_order = fixed + [None] * (solution.num_vertices - len(solution.placed) - len(fixed))
+            self.order_fixed = len(fixed)
+            return
+        self.vertex_order = None
+        solution.placement_order = self.get_placement_order_by_placed_neibs(first)
+        placed = set(solution.placed)
+        self.placed_neibs = []
+        for v in solution.placement_order:
+            self.placed_neibs.append([(n, self.graph[n][v]["dist"]) for n in self.graph[v] if n in placed])
+            placed.add(v)
+
+    def full_solve(self, deadline=None, resume=None):
+        # `resume` is a snapshot written by checkpoint(), the search goes on
+        # from where it was taken
+        controller = self.controller
+        controller.begin(deadline)
+        frames = None
+        if resume is not None:
+            frames = self.restore(resume)
         if self.initial_solution:
             solution = self.initial_solution
-            solution.placement_order = self.get_placement_order_by_placed_neibs(0)  # 0 is ignored
+            self.start(solution)
             print(f"placement_order = {solution.placement_order}")
-            solution.next = 0
+            self.check_resume(resume)
 
             try:
-                self.try_solve(solution)
+                if resume is None:
+                    self.noise = 0.0
+                while not self.run('initial solution', frames) and not controller.done():
+                    frames = None
+                    self.noise = RESTART_NOISE
             except KeyboardInterrupt:
                 solution.print()
                 exit()
 
         else:
-            # Try all initial positions.
+            # Try all initial positions, one run each in turn, until the search
+            # from every one of them got to the end or the budget runs out.
             solution = Solution(self.spec, len(self.vertices))
-            for i in range(len(self.vertices)):
+            if resume is None:
+                self.open_vertices = list(self.start_vertices)
+                self.tried = set()
+                self.next_start = 0
+            while self.open_vertices and not controller.done():
+                i = self.open_vertices[self.next_start % len(self.open_vertices)]
                 print(f"\n\n# Starting from figure vertex {i}")
                 # solution.placement_order = [i] + list(itertools.chain.from_iterable(t[1] for t in nx.bfs_successors(self.graph, i)))
                 # solution.placement_order = list(nx.dfs_preorder_nodes(self.graph, i))
-                solution.placement_order = self.get_placement_order_by_placed_neibs(i)
+                self.start(solution, i)
                 print(f"new placement_order = {solution.placement_order}")
-                solution.next = 0
                 assert(len(solution.placement_order) == solution.num_vertices)
 
+                if frames is None:
+                    self.noise = RESTART_NOISE if i in self.tried else 0.0
+                else:
+                    self.check_resume(resume)
+                self.tried.add(i)
                 try:
-                    self.try_solve(solution)
+                    if self.run(f'vertex {i}', frames):
+                        self.open_vertices.remove(i)
+                    else:
+                        self.next_start += 1
                 except KeyboardInterrupt:
                     solution.print()
                     exit()
-
-    def watchdog(self, solution: Solution):
-        now = time.time()
-        current_depth = len(solution.placed)
-        if current_depth != self.current_depth:
-            if current_depth > self.current_depth:
-                self.current_depth = current_depth
-                self.start_times[current_depth] = now
-            elif current_depth in self.start_times and now - self.start_times[current_depth] > 40:  # too long at the same branch
-                print("\n\nWOOF WOOF WATCHDOT NOT HAPPY\n\n")
-                solution.print()
-                solution.write_to_file(f"solutions/solver/{self.problem_id}_partial")
-                self.start_times = {}
-                self.current_depth = 0
-                raise TrySomethingNew()            
-            
-
-    def try_solve(self, solution):
-        global solution_num
-        self.watchdog(solution)
-
-        if len(solution.placed) == solution.num_vertices:
-            # Done.
-            # solution.print()
-            solution_num += 1
-            solution.write_to_file(f"solutions/solver/{self.problem_id}_{solution_num}")
-            score = count_dislikes_impl(self.spec, solution.vertices)
-            print(f"Found solution! score = {score}")
-
-            if self.best_score is None or score < self.best_score:
-                self.best_score = score
-                self.best_solution = solution
-                self.num_solutions_after_best = 0
-                solution.write_to_file(f"solutions/solver/{self.problem_id}")
-                print("NEW BEST")
-            elif self.best_score:
-                self.num_solutions_after_best += 1
-                if self.num_solutions_after_best > 50:
-                    self.num_solutions_after_best = 0
-                    raise TrySomethingNew()
-
+                frames = None
+            if not controller.done():
+                # every start searched to the end; a stopped run left its position already
+                self.checkpoint()
+        print(controller.summary())
+
+    def run(self, seed, resume=None):
+        # One run of the search from the current start, True if it went
+        # through the whole tree (nothing there beats the best score).
+        self.search(len(self.solution.placement_order), resume=resume)
+        complete = not self.controller.interrupted
+        stats = self.controller.end_run(seed=seed, best=self.best_score, complete=complete)
+        print(f"# run {stats['run']} from {seed}: {stats['nodes']} nodes in {stats['time']:.1f}s, "
+              f"best = {self.best_score}" + (", searched to the end" if complete else ""))
+        return complete
+
+    def checkpoint(self):
+        # Everything full_solve needs to go on from the current search position.
+        if self.checkpoint_path is None:
             return
-
-        next_to_place = solution.placement_order[solution.next]
+        start = time.time()
+        snapshot = {
+            'problem_id': self.problem_id,
+            'bonus': self.bonus,
+            'placement_order': self.solution.placement_order if self.stack else None,
+            'frames': encode_frames(self.position()),
+            'open_vertices': getattr(self, 'open_vertices', None),
+            'tried': sorted(getattr(self, 'tried', ())),
+            'next_start': getattr(self, 'next_start', 0),
+            'noise': self.noise,
+            'rng': encode_rng(self.rng),
+            'best_score': self.best_score,
+            'best_vertices': self.best_vertices,
+            'controller': self.controller.state(),
+            'search_nodes': self.search_nodes,
+            'pruned': self.pruned,
+        }
+        save_checkpoint(self.checkpoint_path, snapshot)
+        print(f"# checkpoint at depth {len(self.stack)} written in {time.time() - start:.3f}s")
+
+    def restore(self, snapshot):
+        # state of a snapshot from checkpoint(), returns the saved search
+        # position (None if it was taken between two runs)
+        if str(snapshot['problem_id']) != str(self.problem_id):
+            raise ValueError(f"checkpoint is for problem {snapshot['problem_id']}, not {self.problem_id}")
+        if snapshot.get('bonus') != self.bonus:
+            raise ValueError(f"checkpoint was taken with bonus {snapshot.get('bonus')}, not {self.bonus}")
+        if snapshot['open_vertices'] is not None:
+            self.open_vertices = snapshot['open_vertices']
+        self.tried = set(snapshot['tried'])
+        self.next_start = snapshot['next_start']
+        self.noise = snapshot['noise']
+        decode_rng(self.rng, snapshot['rng'])
+        self.best_score = snapshot['best_score']
+        if snapshot['best_vertices'] is not None:
+            self.best_vertices = [tuple(pt) if pt is not None else None for pt in snapshot['best_vertices']]
+        self.controller.restore(snapshot['controller'])
+        self.search_nodes = snapshot['search_nodes']
+        self.pruned = snapshot['pruned']
+        if snapshot['placement_order'] is None:
+            return None
+        return decode_frames(snapshot['frames'])
+
+    def check_resume(self, snapshot):
+        # The part of the order fixed by start() has to agree; a dynamic order
+        # is taken from the snapshot, the replay does not pick vertices again.
+        if snapshot is None or snapshot['placement_order'] is None:
+            return
+        order = self.solution.placement_order
+        fixed = self.order_fixed if self.vertex_order is not None else len(order)
+        if len(snapshot['placement_order']) != len(order) or snapshot['placement_order'][:fixed] != order[:fixed]:
+            raise ValueError('checkpoint was taken with another placement order')
+        order[:] = snapshot['placement_order']
+
+    def log(self):
+        # every solution found goes to the solution log of the problem
+        if self.solution_log is None:
+            self.solution_log = SolutionLog(self.problem_id)
+        return self.solution_log
+
+    def cancelled(self):
+        return self.cancel is not None and self.cancel.is_set()
+
+    def best_known(self):
+        # best score of this solver, or of all workers when running in parallel
+        best = self.best_score
+        if self.shared_best is not None:
+            shared = self.shared_best.value
+            if shared >= 0 and (best is None or shared < best):
+                best = shared
+        return best
+
+    def share_score(self, score):
+        if self.shared_best is None:
+            return
+        with self.shared_best.get_lock():
+            if self.shared_best.value < 0 or score < self.shared_best.value:
+                self.shared_best.value = score
+        if score == 0 and self.cancel is not None:
+            self.cancel.set()
+
+    def leaf(self):
+        solution = self.solution
+        # Done.
+        # solution.print()
+        score = solution.dislikes.score()
+        if self.write_solutions:
+            self.log().add(solution.vertices, score, 'integral', [self.bonus] if self.bonus else None)
+        print(f"Found solution! score = {score}")
+        best_known = self.best_known()
+        self.share_score(score)
+
+        if self.best_score is None or score < self.best_score:
+            self.best_score = score
+            self.best_solution = solution
+            self.best_vertices = list(solution.vertices)
+        if best_known is None or score < best_known:
+            print("NEW BEST")
+        if score == 0:
+            self.controller.stop('solved')
+
+    def solve_seed(self, vertex, hole_idx, time_limit=None):
+        # Search from figure vertex `vertex` pinned to hole vertex `hole_idx` only.
+        # Returns the best score of this seed and its vertices (None, None if none found).
+        solution = Solution(self.spec, len(self.vertices))
+        self.start(solution, vertex)
+        self.best_score = None
+        self.best_solution = None
+        self.best_vertices = None
+        self.controller.begin(time.time() + time_limit if time_limit else None)
+
+        initial_points = self.initial_points
+        self.initial_points = [tuple(self.spec['hole'][hole_idx])]
+        try:
+            self.noise = 0.0
+            while not self.run(f'vertex {vertex} at hole {hole_idx}') and not self.controller.done():
+                self.noise = RESTART_NOISE
+        finally:
+            self.initial_points = initial_points
+        return self.best_score, self.best_vertices
+
+    def bonus_candidates(self, depth):
+        # Positions for the next vertex under the bonus, from rings as wide as
+        # what is left of it allows: the GLOBALIST budget left, every ring but
+        # one while the SUPERFLEX edge is free (with two placed neighbours or
+        # more, one ring alone would let the vertex go anywhere; with one, see
+        # flex_candidates), points out of the hole while the WALLHACK vertex is
+        # free. Every point then goes through BonusBudget.charge and the check
+        # of its edges that have to stay inside the hole (all but the ones of
+        # the WALLHACK vertex).
+        solution, budget = self.solution, self.budget
+        v = solution.placement_order[depth]
+        neibs = self.placed_neibs[depth]
+        assert neibs
+        origins = [solution.vertices[n] for n, _ in neibs]
+        lens = [len2 for _, len2 in neibs]
+        epsilon = budget.ring_epsilon(self.epsilon)
+
+        skips = range(len(neibs)) if budget.flex_free() and len(neibs) > 1 else [None]
+        found = {}
+        for skip in skips:
+            rest = [i for i in range(len(neibs)) if i != skip]
+            k = min(rest, key=lambda i: lens[i])
+            if budget.outside_free():
+                points = self.candidate_cache.ring(origins[k], lens[k], epsilon)
+            else:
+                # no point inside the hole is farther than its bounding box is wide
+                span2 = (self.raster.width - 1) ** 2 + (self.raster.height - 1) ** 2
+                points = self.candidate_cache.ring(origins[k], lens[k], min(epsilon, max(self.epsilon, span2 / lens[k] - 1)))
+                points = points[self.raster.contains_many(points)]
+            others = [i for i in rest if i != k]
+            points = intersect_rings(points, [origins[i] for i in others], [lens[i] for i in others], epsilon)
+            found.update(dict.fromkeys(as_points(points)))
+
+        cache = edge_cache(self.spec)
+        res = []
+        for pt in found:
+            inside = self.raster.contains(*pt)
+            edges = [(n, len2, dist2(origin, pt)) for (n, len2), origin in zip(neibs, origins)]
+            if budget.charge(v, inside, edges) is None:
+                continue
+            if inside and not all(n == budget.outside or cache.is_edge_inside(origin, pt)
+                                  for (n, _), origin in zip(neibs, origins)):
+                continue
+            res.append(pt)
+        return res
+
+    def flex_candidates(self, depth, ring_points):
+        # With the SUPERFLEX edge free and one placed neighbour, that edge may
+        # be the flex one and the vertex may go anywhere in the hole its edge
+        # stays inside of. These come after the ring points, the ones that
+        # stretch the edge least first.
+        solution = self.solution
+        (n, len2), = self.placed_neibs[depth]
+        origin = solution.vertices[n]
+        points = np.array(self.inside_points, dtype=np.int64)
+        d2 = ((points - np.array(origin, dtype=np.int64)) ** 2).sum(axis=1)
+        stretch = np.abs(d2 - len2)
+        # the ring points fit the edge already
+        keep = np.flatnonzero(stretch * 10**6 > self.spec['epsilon'] * len2)
+        keep = keep[np.argsort(stretch[keep], kind='stable')]
+        cache = edge_cache(self.spec)
+        seen = set(ring_points)
+        return [pt for pt in as_points(points[keep]) if pt not in seen and cache.is_edge_inside(origin, pt)]
+
+    def candidates(self, depth):
+        solution = self.solution
+        if self.vertex_order is not None and depth >= self.order_fixed:
+            solution.placement_order[depth] = self.vertex_order.best()
+        next_to_place = solution.placement_order[depth]
         assert next_to_place not in solution.placed
 
-        # Advance.
-        solution.next += 1
-        assert solution.next >= len(solution.placement_order) or solution.placement_order[solution.next] not in solution.placed
-
         if not solution.placed:
             # first the first one
-            for pt in self.initial_points:
-                solution.place(next_to_place, pt)
-                stash = solution.stash()
-                try:
-                    self.try_solve(solution)
-                except TrySomethingNew:
-                    solution.recover_stash(stash)
-                    print("Trying anothing initial position.")
-                solution.unplace(next_to_place, pt)
+            if self.noise:
+                points = list(self.initial_points)
+                self.rng.shuffle(points)
+                return points
+            return self.initial_points
+
+        if self.budget is not None:
+            viable_points = self.bonus_candidates(depth)
+        elif self.domains is not None:
+            # forward checking already left only the positions that fit all placed neighbours
+            viable_points = self.domains.points_of(self.domains.domains[next_to_place])
         else:
             # some neighbors already placed
-            viable_points = None
-            neibs = []
-            for neib in self.graph[next_to_place]:
-                if neib in solution.placed:
-                    neibs.append(neib)
-                    neib_dist = self.graph[neib][next_to_place]["dist"]
-
-                    viable_points = viable_adj_points_with_candidates(
-                        solution.vertices[neib], neib_dist, self.epsilon, viable_points=viable_points,
-                        bounds_check_fn = lambda pt: (
-                            pt in self.inside_points_set and # fast
-                            # is_edge_not_overlapping_hole(self.spec, solution.vertices[neib], pt) and  # slower
-                            # is_edge_points_inside_fast(self.inside_points_set, solution.vertices[neib], pt)# slowest
-                            is_edge_inside_fast(self.spec, solution.vertices[neib], pt)
-                        ))
-
-
-            # print(f"viable_points for {next_to_place} (neibs {neibs}): {viable_points}")
+            neibs = self.placed_neibs[depth]
+            origins = [solution.vertices[neib] for neib, _ in neibs]
+            lens = [len2 for _, len2 in neibs]
 
             # Must have at least one neib that's placed already.
-            assert viable_points is not None
-
-            # viable_points = [
-            #     pt for pt in viable_points
-            #     if self.is_point_reachable_from_points(solution, solution.placed, next_to_place, pt)
-            # ]
-
-            # print(f"viable_points for {next_to_place} (neibs {neibs}): {viable_points}")
-
-            if viable_points:
-
-                def metric(pt):
-                    if pt in solution.hole_dict and not solution.hole_status[solution.hole_dict[pt]]:
-                        print(f"{pt} is a FREE HOLE")
-                        return 1000000
-
-                    total_dislikes = 0
-                    # for hole_pt, i in solution.hole_dict.items():
-                    #     if solution.hole_status[i]:
-                    #         continue
-                    #     total_dislikes += dist2(hole_pt, pt)
-                    for pi in solution.placed:
-                        total_dislikes += dist2(solution.vertices[pi], pt)
-
-                    return total_dislikes
-
-                # if any(pt in solution.hole_dict for pt in viable_points):
+            assert neibs
+
+            # Start from the smallest ring (inside the hole, edge inside the hole),
+            # keep the points that lie on every other ring too and have their edges
+            # inside the hole as well.
+            k = self.rings.smallest(lens)
+            viable_points = intersect_rings(
+                self.candidate_cache.inside_ring(origins[k], lens[k], self.epsilon),
+                origins[:k] + origins[k+1:], lens[:k] + lens[k+1:], self.epsilon)
+            viable_points = [
+                pt for pt in as_points(viable_points)
+                if all(is_edge_inside(self.spec, origin, pt) for origin in origins[:k] + origins[k+1:])
+            ]
+
+        if viable_points:
+            keep = self.reachable_mask(solution, solution.placed, next_to_place, viable_points)
+            viable_points = [pt for pt, ok in zip(viable_points, keep) if ok]
+
+        if viable_points:
+
+            def metric(pt):
+                if pt in solution.hole_dict and not solution.hole_status[solution.hole_dict[pt]]:
+                    print(f"{pt} is a FREE HOLE")
+                    return 1000000
+
+                total_dislikes = 0
+                # for hole_pt, i in solution.hole_dict.items():
+                #     if solution.hole_status[i]:
+                #         continue
+                #     total_dislikes += dist2(hole_pt, pt)
+                for pi in solution.placed:
+                    total_dislikes += dist2(solution.vertices[pi], pt)
+
+                return total_dislikes
+
+            # if any(pt in solution.hole_dict for pt in viable_points):
+            if self.noise:
+                noise, rng = self.noise, self.rng
+                viable_points.sort(key=lambda p: metric(p) * (1 + noise * (2 * rng.random() - 1)), reverse=True)
+            else:
                 viable_points.sort(key=lambda p: metric(p), reverse=True)
-                # else:
-                #     random.shuffle(viable_points)
+            # else:
+            #     random.shuffle(viable_points)
 
-                for pt in viable_points:
-                    solution.place(next_to_place, pt)
+        if self.budget is not None and self.budget.flex_free() and len(self.placed_neibs[depth]) == 1:
+            viable_points = viable_points + self.flex_candidates(depth, viable_points)
 
-                    # # validation (optional)
-                    # for neib in self.graph[next_to_place]:
-                    #     if neib in solution.placed:
-                    #         neib_dist = self.graph[neib][next_to_place]["dist"]
-                    #         if not check_edge_length(self.spec, solution.vertices, (neib, next_to_place)):
-                    #             print(f"check_edge_length failed for {neib} with dist {neib_dist}")
-                    #             assert False
-                    #         if not is_edge_inside(self.spec, solution.vertices[neib], pt):
-                    #             print(f"is_edge_inside failed for {neib}")
-                    #             assert False
+        return viable_points
 
-                    self.try_solve(solution)
-                    solution.unplace(next_to_place, pt)
+    def assign(self, depth, pt):
+        solution = self.solution
+        v = solution.placement_order[depth]
+        if self.budget is not None:
+            edges = [(n, len2, dist2(solution.vertices[n], pt)) for n, len2 in self.placed_neibs[depth]]
+            state = self.budget.charge(v, self.raster.contains(*pt), edges)
+            if state is None:
+                return False
+            self.trail.push(self.budget.restore, self.budget.take(state))
+        if self.domains is not None:
+            mark = self.domains.mark()
+            self.trail.push(self.domains.undo, mark)
+            if not self.domains.assign(v, pt):
+                return False
+        solution.place(v, pt)
+        self.trail.push(solution.unplace, v, pt)
+        self.placed_mask[v] = True
+        self.trail.push(self.placed_mask.__setitem__, v, False)
+        if self.vertex_order is not None:
+            self.vertex_order.place(v)
+            self.trail.push(self.vertex_order.unplace, v)
+        best = self.best_known()
+        if (best is not None and not self.replaying and len(solution.placed) >= BOUND_MIN_PLACED
+                and self.lower_bound(best) >= best):
+            # branch and bound: nothing below can beat the best solution
+            self.pruned += 1
+            return False
+        return True
 
-        # Backoff.
-        if solution.vertices[next_to_place] is not None:
-            solution.vertices[next_to_place] = None
-            solution.placed.remove(next_to_place)
-        solution.next -= 1
+    def lower_bound(self, best=None):
+        # Admissible bound on the dislikes of any completion of the placed
+        # vertices: every hole vertex is at least as far as the closest of the
+        # placed vertices and of the points still open to the rest. The reach
+        # discs go first; the union of the open domains is only looked at if
+        # they alone do not get the bound to `best`.
+        solution = self.solution
+        if self.reach_epsilon is None:
+            return 0
+        placed = np.flatnonzero(self.placed_mask)
+        unplaced = np.flatnonzero(~self.placed_mask)
+        reach = reach_lower_bound(solution.hole, self.shortest_distances, self.reach_epsilon,
+                                  placed, [solution.vertices[v] for v in placed], unplaced)
+        bound = solution.dislikes.bounded_score(reach)
+        if best is not None and bound >= best:
+            return bound
+        if self.domains is not None and len(unplaced):
+            bits = 0
+            for v in unplaced:
+                bits |= self.domains.domains[v]
+            if bits.bit_count() <= DOMAIN_BOUND_POINTS:
+                if bits:
+                    points = self.domains.raster.points[self.domains.indices(bits)].astype(np.int64)
+                    d = ((points[:, None, :] - solution.dislikes.hole_arr[None, :, :]) ** 2).sum(axis=2).min(axis=0)
+                    reach = np.maximum(reach, d).tolist()
+                else:
+                    # an empty domain: no completion at all
+                    return math.inf
+        return solution.dislikes.bounded_score(reach)
 
 
 def write_solution(solution_file, total_points, solution):
@@ -748,6 +1044,13 @@ def solve_and_win(problem_id):
     print (f'=== Solving {problem_id} ====')
 
     spec = read_problem(problem_id)
+    bonus = None
+    if FLAGS.bonus:
+        edge = [int(v) for v in FLAGS.break_leg] if FLAGS.break_leg else None
+        bonus = bonus_entry(problem_id, FLAGS.bonus, FLAGS.bonus_from, edge, spec)
+        print ('bonus:', bonus)
+        if FLAGS.bonus == BREAK_A_LEG:
+            spec = break_leg(spec, bonus['edge'])
     # print (spec)
     print ('edges:', len(spec['figure']['edges']))
     print ('vertices:', len(spec['figure']['vertices']))
@@ -764,12 +1067,26 @@ def solve_and_win(problem_id):
         sol.place(f, tuple(spec["hole"][h]))
     initial_solution = sol
 
-    solver = IntegralSolver(spec =spec, initial_solution =initial_solution, problem_id=problem_id)
+    cache = edge_cache(spec, max_bytes=FLAGS.edge_cache_mb * 2**20)
+    candidates = candidate_cache(spec, max_bytes=FLAGS.candidate_cache_mb * 2**20)
+    solver = IntegralSolver(spec =spec, initial_solution =initial_solution, problem_id=problem_id, use_domains=FLAGS.domains,
+                             use_symmetry=FLAGS.symmetry, controller=controller_from_flags(), bonus=bonus)
     print ('inside points:', len(solver.inside_points))
-    try:
-        solver.full_solve()
-    except TimeoutException:
-        pass
+    resume = None
+    if FLAGS.checkpoint_every:
+        solver.checkpoint_path = checkpoint_path(problem_id, FLAGS.checkpoint_dir)
+        if FLAGS.resume:
+            if os.path.exists(solver.checkpoint_path):
+                resume = load_checkpoint(solver.checkpoint_path)
+                print (f'Resuming from {solver.checkpoint_path}')
+            else:
+                print (f'No checkpoint at {solver.checkpoint_path}, starting over')
+    solver.full_solve(resume=resume)
+    if solver.solution_log is not None:
+        solver.solution_log.close()
+        print (solver.solution_log)
+    print (cache)
+    print (candidates)
 
 def solve_and_submit(problem_id):
     print ('')
@@ -780,12 +1097,9 @@ def solve_and_submit(problem_id):
     print ('edges:', len(spec['figure']['edges']))
     print ('vertices:', len(spec['figure']['vertices']))
 
-    solver = Solver(spec, len_matching=True)
+    solver = Solver(spec, len_matching=True, use_symmetry=FLAGS.symmetry, controller=controller_from_flags(TIMEOUT))
     print ('inside points:', len(solver.inside_points))
-    try:
-        solver.full_solve()
-    except TimeoutException:
-        pass
+    solver.full_solve()
 
     total_points = len(spec['figure']['vertices'])
     # write_solution(f'solutions/debug/{problem_id}', total_points, solver.partial_solution)
@@ -863,70 +1177,6 @@ def try_to_fix_edges(spec, solution):
         if not check_edge_length(spec, solution, edge):
             fix_edge(spec, solution, edge)
 
-_VIABLE_ADJ_POINTS = {}
-
-def viable_adj_points(origin, len2, epsilon, bounds_check_fn=None):
-    """Returns a list of int points within dist and eps."""
-    cache_key = (origin[0], origin[1], int(len2 * 1000000), int(epsilon * 1000000))
-    if cache_key in _VIABLE_ADJ_POINTS:
-        return _VIABLE_ADJ_POINTS[cache_key]
-
-    vectors = viable_vectors(len2, epsilon)
-    points = []
-    x, y = origin
-    points += [(x + px, y + py) for (px, py) in vectors]
-    points += [(x + px, y - py) for (px, py) in vectors]
-    points += [(x - px, y + py) for (px, py) in vectors]
-    points += [(x - px, y - py) for (px, py) in vectors]
-
-    if bounds_check_fn:
-        points = [p for p in points if bounds_check_fn(p)]
-
-    _VIABLE_ADJ_POINTS[cache_key] = points
-
-    return points
-
-def viable_adj_points_with_candidates(origin, dist_2, epsilon, viable_points = None, bounds_check_fn = None):
-    """Returns a list of int points within dist and eps, with some candidates."""
-    if viable_points is not None:
-        result = [
-            pt 
-            for pt in viable_points
-            if check_distance_with_eps(orig_dist=dist_2, new_dist=dist2(origin, pt), epsilon=epsilon)
-        ]
-        return result
-
-    return viable_adj_points(origin, dist_2, epsilon, bounds_check_fn=bounds_check_fn)
-
-
-_VIABLE_VECTORS_CACHE = {}
-
-def viable_vectors(len2, epsilon):
-    cache_key = (int(len2 * 1000000), int(epsilon * 1000000))
-    if cache_key in _VIABLE_VECTORS_CACHE:
-        return _VIABLE_VECTORS_CACHE[cache_key]
-
-    low2, high2 = len2 * (1 - epsilon), len2 * (1 + epsilon)
-    high = floor(high2 ** 0.5)
-    x, x2 = 0, 0
-    vectors = []
-    # print(low2, high2, high)
-    while x2 <= high2:
-        while high >= 0 and x2 + high * high > high2:
-            high -= 1
-        y = high
-        while y >= 0 and x2 + y * y >= low2:
-            if check_distance_with_eps(orig_dist=len2, new_dist=dist2((0, 0), (x, y)), epsilon=epsilon):
-                vectors.append((x, y))
-            y -= 1
-        x += 1
-        x2 = x * x
-
-    _VIABLE_VECTORS_CACHE[cache_key] = vectors
-
-    return vectors
-
-
 def submit_manual(problem_id, solution_file_name):
     print(f'=== Submitting {problem_id} ====')
 
@@ -6,6 +6,7 @@ from utils import read_json, read_problem
 from get_problems import submit_solution
 
 from collect_golden import validate_solution, count_dislikes
+from batch_validate import validate_batch
 
 from shapely.geometry import Point, Polygon
 
@@ -24,9 +25,13 @@ def main():
         spec['hole_poly'] = Polygon(spec['hole'])
 
         solution = read_json(file_path)
-        ok = validate_solution(spec, solution)
+        if not solution.get('bonuses') and len(solution.get('vertices', [])) == len(spec['figure']['vertices']):
+            result = validate_batch(spec, [solution['vertices']])
+            ok, dislikes = result.valid[0], int(result.dislikes[0])
+        else:
+            ok = validate_solution(spec, solution)
+            dislikes = count_dislikes(spec, solution) if ok else None
         if ok:
-            dislikes = count_dislikes(spec, solution)
             submitted_dislikes = js_stats[str(i)]['dislikes']
             if submitted_dislikes is None or dislikes < int(submitted_dislikes):
                 print ('id {}: found better solution {} vs {}'.format(
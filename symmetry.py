@@ -0,0 +1,139 @@
+import networkx as nx
+from networkx.algorithms.isomorphism import GraphMatcher
+
+
+# the 8 lattice isometries fixing the origin: rotations by 90 degrees and reflections
+LATTICE_MAPS = (
+    (1, 0, 0, 1), (0, -1, 1, 0), (-1, 0, 0, -1), (0, 1, -1, 0),
+    (1, 0, 0, -1), (-1, 0, 0, 1), (0, 1, 1, 0), (0, -1, -1, 0),
+)
+
+
+def _figure_graph(spec):
+    vtx = spec['figure']['vertices']
+    graph = nx.Graph()
+    graph.add_nodes_from(range(len(vtx)))
+    for a, b in spec['figure']['edges']:
+        graph.add_edge(a, b, dist=(vtx[a][0] - vtx[b][0]) ** 2 + (vtx[a][1] - vtx[b][1]) ** 2)
+    return graph
+
+
+def refine_colors(graph):
+    # Colour refinement with edge lengths: vertices of different colours are
+    # never swapped by an automorphism (the converse does not always hold).
+    colors = {v: 0 for v in graph}
+    num_colors = 1
+    while True:
+        signatures = {
+            v: (colors[v], tuple(sorted((d['dist'], colors[n]) for n, d in graph[v].items())))
+            for v in graph
+        }
+        palette = {sig: i for i, sig in enumerate(sorted(set(signatures.values())))}
+        colors = {v: palette[signatures[v]] for v in graph}
+        if len(palette) == num_colors:
+            return colors
+        num_colors = len(palette)
+
+
+def _automorphism(graph, colors, u, v):
+    # an automorphism keeping edge lengths that maps u to v, None if there is none
+    def node_match(a, b):
+        return a['color'] == b['color'] and a['pin'] == b['pin']
+
+    g1, g2 = graph.copy(), graph.copy()
+    for g, pinned in ((g1, u), (g2, v)):
+        for n in g:
+            g.nodes[n]['color'] = colors[n]
+            g.nodes[n]['pin'] = n == pinned
+    matcher = GraphMatcher(g1, g2, node_match=node_match, edge_match=lambda a, b: a['dist'] == b['dist'])
+    return next(matcher.isomorphisms_iter(), None)
+
+
+def compute_figure_orbits(spec):
+    # Orbits of the figure vertices under the automorphisms of the figure
+    # graph that keep every edge length, as a sorted list of sorted lists.
+    graph = _figure_graph(spec)
+    colors = refine_colors(graph)
+    parent = list(range(len(graph)))
+
+    def find(v):
+        while parent[v] != v:
+            parent[v] = parent[parent[v]]
+            v = parent[v]
+        return v
+
+    cells = {}
+    for v in sorted(graph):
+        cells.setdefault(colors[v], []).append(v)
+    for cell in cells.values():
+        reps = []
+        for v in cell:
+            for u in reps:
+                if find(u) == find(v):
+                    break
+                mapping = _automorphism(graph, colors, u, v)
+                if mapping is not None:
+                    # the whole permutation, not just u -> v, joins orbits
+                    for a, b in mapping.items():
+                        parent[find(a)] = find(b)
+                    break
+            else:
+                reps.append(v)
+
+    orbits = {}
+    for v in graph:
+        orbits.setdefault(find(v), []).append(v)
+    return sorted(sorted(orbit) for orbit in orbits.values())
+
+
+def compute_hole_symmetries(hole):
+    # Permutations of the hole vertex indices (as lists, identity included)
+    # induced by the lattice isometries that map the hole onto itself.
+    points = [tuple(pt) for pt in hole]
+    index = {pt: i for i, pt in enumerate(points)}
+    n = len(points)
+    edges = {frozenset((i, (i + 1) % n)) for i in range(n)}
+    anchor = min(points)
+    res = []
+    for a, b, c, d in LATTICE_MAPS:
+        moved = [(a * x + b * y, c * x + d * y) for x, y in points]
+        # a map onto itself has to take the smallest point to the smallest point
+        mx, my = min(moved)
+        dx, dy = anchor[0] - mx, anchor[1] - my
+        perm = [index.get((x + dx, y + dy)) for x, y in moved]
+        if None in perm or len(set(perm)) != n:
+            continue
+        if all(frozenset((perm[i], perm[(i + 1) % n])) in edges for i in range(n)):
+            res.append(perm)
+    return res
+
+
+def hole_orbits(spec):
+    # Orbits of the hole vertex indices under compute_hole_symmetries.
+    if 'hole_orbits' not in spec:
+        perms = compute_hole_symmetries(spec['hole'])
+        seen = set()
+        orbits = []
+        for h in range(len(spec['hole'])):
+            if h in seen:
+                continue
+            orbit = sorted({perm[h] for perm in perms})
+            seen.update(orbit)
+            orbits.append(orbit)
+        spec['hole_orbits'] = orbits
+    return spec['hole_orbits']
+
+
+def figure_orbits(spec):
+    # compute_figure_orbits, computed once per problem spec.
+    if 'figure_orbits' not in spec:
+        spec['figure_orbits'] = compute_figure_orbits(spec)
+    return spec['figure_orbits']
+
+
+def seed_representatives(spec):
+    # (figure vertices, hole vertex indices) to start searches from. A figure
+    # automorphism relabels a solution and a hole symmetry moves it to another
+    # one with the same dislikes, so every (vertex, hole vertex) seed has an
+    # equivalent one among (figure orbit minimum, hole orbit minimum) pairs.
+    return [orbit[0] for orbit in figure_orbits(spec)], [orbit[0] for orbit in hole_orbits(spec)]
@@ -0,0 +1,110 @@
+import pytest
+
+from bonuses import BREAK_A_LEG, GLOBALIST, SUPERFLEX, WALLHACK, BonusBudget, break_leg
+from collect_golden import validate_solution
+
+
+# A 20-long U in a 60 x 60 hole. Edges may stretch by 1%: a squared length
+# of 404 fits, 405 (18, 9) does not, and GLOBALIST lets the three edges
+# stretch by 3% together, so two edges of 405 fit and three do not.
+def make_spec():
+    return {
+        'hole': [[0, 0], [60, 0], [60, 60], [0, 60]],
+        'epsilon': 10000,
+        'figure': {'vertices': [[0, 0], [20, 0], [20, 20], [0, 20]], 'edges': [[0, 1], [1, 2], [2, 3]]},
+    }
+
+
+STRICT = [[5, 5], [25, 5], [25, 25], [5, 25]]
+TWO_STRETCHED = [[5, 5], [23, 14], [32, 32], [12, 32]]
+THREE_STRETCHED = [[5, 5], [23, 14], [32, 32], [14, 23]]
+ONE_FLEXED = [[5, 5], [25, 5], [25, 25], [50, 50]]
+# vertex 0 out of the hole, and vertices 0 and 3
+ONE_OUTSIDE = [[30, -10], [30, 10], [50, 10], [50, 30]]
+TWO_OUTSIDE = [[30, -10], [30, 10], [50, 10], [70, 10]]
+
+
+def solution(vertices, bonus=None, **entry):
+    res = {'vertices': vertices}
+    if bonus is not None:
+        res['bonuses'] = [dict(bonus=bonus, problem=1, **entry)]
+    return res
+
+
+@pytest.mark.parametrize('vertices, bonus, valid', [
+    (STRICT, None, True),
+    (TWO_STRETCHED, None, False),
+    (ONE_FLEXED, None, False),
+    (ONE_OUTSIDE, None, False),
+    (STRICT, GLOBALIST, True),
+    (TWO_STRETCHED, GLOBALIST, True),
+    (THREE_STRETCHED, GLOBALIST, False),
+    (ONE_FLEXED, GLOBALIST, False),
+    (STRICT, SUPERFLEX, True),
+    (ONE_FLEXED, SUPERFLEX, True),
+    (TWO_STRETCHED, SUPERFLEX, False),
+    (ONE_OUTSIDE, SUPERFLEX, False),
+    (STRICT, WALLHACK, True),
+    (ONE_OUTSIDE, WALLHACK, True),
+    (TWO_OUTSIDE, WALLHACK, False),
+    (ONE_FLEXED, WALLHACK, False),
+])
+def test_validate_solution(vertices, bonus, valid):
+    assert validate_solution(make_spec(), solution(vertices, bonus)) == valid
+
+
+def test_validate_break_a_leg():
+    spec = make_spec()
+    assert validate_solution(spec, solution(STRICT + [[25, 15]], BREAK_A_LEG, edge=[1, 2]))
+    assert validate_solution(spec, solution(STRICT + [[25, 15]], BREAK_A_LEG, edge=[2, 1]))
+    # the new vertex has to keep both halves of the edge
+    assert not validate_solution(spec, solution(STRICT + [[23, 15]], BREAK_A_LEG, edge=[1, 2]))
+    assert not validate_solution(spec, solution(STRICT, BREAK_A_LEG, edge=[1, 2]))
+    assert not validate_solution(spec, solution(STRICT + [[25, 15]], BREAK_A_LEG, edge=[0, 2]))
+    assert not validate_solution(spec, solution(STRICT + [[25, 15]]))
+
+
+def test_validate_bad_bonuses():
+    spec = make_spec()
+    two = solution(STRICT, GLOBALIST)
+    two['bonuses'].append({'bonus': SUPERFLEX, 'problem': 2})
+    assert not validate_solution(spec, two)
+    assert not validate_solution(spec, solution(STRICT, 'TELEPORT'))
+
+
+def test_break_leg():
+    broken = break_leg(make_spec(), [2, 1])
+    assert broken['figure']['vertices'][4] == [20, 10]
+    assert broken['figure']['edges'] == [[0, 1], [2, 3], [2, 4], [4, 1]]
+    with pytest.raises(ValueError):
+        break_leg(make_spec(), [0, 3])
+
+
+def test_budget_take_restore():
+    budget = BonusBudget(make_spec(), SUPERFLEX)
+    assert budget.flex_free()
+    fits, stretched = (0, 400, 404), (0, 400, 405)
+    state = budget.charge(1, True, [stretched])
+    assert state is not None and budget.flex_free()
+    old = budget.take(state)
+    assert budget.flex_edge == (0, 1) and not budget.flex_free()
+    assert budget.charge(2, True, [fits]) is not None
+    assert budget.charge(2, True, [stretched]) is None
+    assert budget.charge(2, False, [fits]) is None
+    budget.restore(old)
+    assert budget.flex_free()
+
+    budget = BonusBudget(make_spec(), WALLHACK)
+    budget.take(budget.charge(0, False, []))
+    assert budget.outside == 0
+    assert budget.charge(1, False, [fits]) is None
+    assert budget.charge(1, True, [stretched]) is None
+
+    budget = BonusBudget(make_spec(), GLOBALIST)
+    assert budget.reach_epsilon(0.01) == pytest.approx(0.03)
+    budget.take(budget.charge(1, True, [stretched]))
+    budget.take(budget.charge(2, True, [stretched]))
+    assert budget.remaining() == pytest.approx(0.005)
+    assert budget.charge(3, True, [stretched]) is None
+    assert budget.charge(3, True, [fits]) is None
+    assert budget.charge(3, True, [(0, 400, 400)]) is not None
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from candidates import ArrayCache, ring_vectors
+
+
+def brute_force(len2, epsilon):
+    r = int((len2 * (1 + epsilon)) ** 0.5) + 1
+    return sorted((x, y) for x in range(-r, r + 1) for y in range(-r, r + 1)
+                  if abs((x * x + y * y) / len2 - 1) <= epsilon)
+
+
+@pytest.mark.parametrize('len2, epsilon', [(1, 0.0), (25, 0.0), (50, 0.01), (1000, 0.05), (405, 0.0125)])
+def test_ring_vectors(len2, epsilon):
+    assert sorted(map(tuple, ring_vectors(len2, epsilon).tolist())) == brute_force(len2, epsilon)
+
+
+def test_ring_vectors_keyed_on_exact_epsilon():
+    # these two used to share an entry, epsilons were cut to whole millionths;
+    # only the first takes 1013 = 22^2 + 23^2, 14 / 999 off
+    wide, narrow = ring_vectors(999, 0.0140145), ring_vectors(999, 0.01401401)
+    assert len(wide) > len(narrow)
+
+
+def test_array_cache_bound():
+    cache = ArrayCache(max_bytes=3 * (800 + 200))
+    for i in range(5):
+        cache.store(i, np.zeros(100, dtype=np.int64))
+    assert cache.nbytes <= cache.max_bytes
+    assert cache.lookup(0) is None and cache.lookup(4) is not None
+    assert cache.stats()['evictions'] == 2
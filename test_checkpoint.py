@@ -0,0 +1,57 @@
+import random
+
+import pytest
+
+from checkpoint import decode_frames, decode_rng, encode_frames, encode_rng, load_checkpoint, save_checkpoint
+from search import SearchController
+from solve import IntegralSolver
+from utils import read_problem
+
+
+def test_round_trip(tmp_path):
+    rng = random.Random(7)
+    rng.random()
+    frames = [([(1, 2), (3, 4)], 1), ([], 0), ([(5, 6)], 0)]
+    path = str(tmp_path / 'sub' / '1.json')
+    save_checkpoint(path, {'frames': encode_frames(frames), 'rng': encode_rng(rng)})
+    snapshot = load_checkpoint(path)
+    assert decode_frames(snapshot['frames']) == frames
+    restored = random.Random()
+    decode_rng(restored, snapshot['rng'])
+    assert [restored.random() for _ in range(5)] == [rng.random() for _ in range(5)]
+
+
+def run(problem_id, use_domains, node_limit, path, resume=None):
+    controller = SearchController(node_limit=node_limit, restart='luby', restart_nodes=500)
+    solver = IntegralSolver(read_problem(problem_id), None, problem_id, use_domains=use_domains,
+                            controller=controller)
+    solver.write_solutions = False
+    solver.checkpoint_path = path
+    solver.rng.seed(1)
+    solver.full_solve(resume=resume)
+    return solver
+
+
+def run_stats(solver):
+    return [{key: run[key] for key in ('run', 'nodes', 'seed', 'best', 'complete', 'stopped')}
+            for run in solver.controller.runs]
+
+
+# 2000 nodes is where a run of the luby schedule ends, 2300 is in the middle of one
+@pytest.mark.parametrize('split', [2000, 2300])
+@pytest.mark.parametrize('problem_id, use_domains', [(1, False), (52, True)])
+def test_split_run_resumes_the_same(tmp_path, problem_id, use_domains, split):
+    whole = run(problem_id, use_domains, 4000, str(tmp_path / 'whole.json'))
+    half = run(problem_id, use_domains, split, str(tmp_path / 'half.json'))
+    assert half.controller.stopped == 'nodes'
+    resumed = run(problem_id, use_domains, 4000, str(tmp_path / 'resumed.json'),
+                  resume=load_checkpoint(str(tmp_path / 'half.json')))
+
+    assert resumed.best_score == whole.best_score
+    assert resumed.best_vertices == whole.best_vertices
+    assert resumed.controller.nodes == whole.controller.nodes
+    assert run_stats(resumed) == run_stats(whole)
+    assert resumed.search_nodes == whole.search_nodes
+    assert resumed.pruned == whole.pruned
+    assert load_checkpoint(str(tmp_path / 'resumed.json'))['frames'] == \
+        load_checkpoint(str(tmp_path / 'whole.json'))['frames']
@@ -0,0 +1,34 @@
+import random
+
+import pytest
+
+from dislikes import DislikesTracker, count_dislikes
+from utils import read_problem
+
+
+def brute_force(hole, points):
+    return sum(min((hx - x) ** 2 + (hy - y) ** 2 for x, y in points) for hx, hy in hole)
+
+
+@pytest.mark.parametrize('problem_id', [1, 14, 52, 66])
+def test_tracker_matches_brute_force(problem_id):
+    hole = [tuple(p) for p in read_problem(problem_id)['hole']]
+    xs, ys = [x for x, _ in hole], [y for _, y in hole]
+    rng = random.Random(problem_id)
+    # few distinct points, so that the same distances get placed and removed many times
+    pool = [(rng.randint(min(xs), max(xs)), rng.randint(min(ys), max(ys))) for _ in range(8)] + hole[:3]
+    tracker = DislikesTracker(hole)
+    placed = []
+    for _ in range(500):
+        if placed and rng.random() < 0.45:
+            tracker.unplace(placed.pop(rng.randrange(len(placed))))
+        else:
+            placed.append(rng.choice(pool))
+            tracker.place(placed[-1])
+        assert tracker.count == len(placed)
+        if not placed:
+            continue
+        assert tracker.score() == brute_force(hole, placed) == count_dislikes(hole, placed)
+        pt = rng.choice(pool)
+        assert tracker.score_if_placed(pt) == brute_force(hole, placed + [pt])
+        assert tracker.score_candidates(pool).tolist() == [brute_force(hole, placed + [p]) for p in pool]
@@ -0,0 +1,56 @@
+import random
+
+import pytest
+
+from domains import Domains, VertexOrder
+from solve import IntegralSolver
+from utils import read_problem
+
+
+def brute_force_best(domains, placed):
+    keys = [(domains.domains[v].bit_count(), -sum(placed[u] for u, _ in domains.adj[v]), -len(domains.adj[v]), v)
+            for v in range(len(placed)) if not placed[v]]
+    return min(keys)[3] if keys else None
+
+
+@pytest.mark.parametrize('problem_id', [23, 52, 55])
+def test_vertex_order_matches_brute_force(problem_id):
+    spec = read_problem(problem_id)
+    adj = {}
+    for a, b in spec['figure']['edges']:
+        adj.setdefault(a, []).append(b)
+        adj.setdefault(b, []).append(a)
+    domains = Domains(spec, adj, spec['epsilon'] / 1000000.0)
+    order = VertexOrder(domains)
+    rng = random.Random(problem_id)
+    placed = [False] * len(spec['figure']['vertices'])
+    stack = []
+    for _ in range(300):
+        v = order.best()
+        assert v == brute_force_best(domains, placed)
+        if v is not None and rng.random() < 0.6:
+            mark = domains.mark()
+            if domains.assign(v, rng.choice(domains.points_of(domains.domains[v]))):
+                order.place(v)
+                placed[v] = True
+                stack.append((v, mark))
+                continue
+            domains.undo(mark)
+        elif stack:
+            # back up the way the solver's trail does: the order first, then the domains
+            v, mark = stack.pop()
+            order.unplace(v)
+            placed[v] = False
+            domains.undo(mark)
+
+
+@pytest.mark.parametrize('problem_id', [19, 27, 28, 29, 52])
+def test_dynamic_order_keeps_the_optimum(problem_id):
+    best = []
+    for use_domains in (True, False):
+        solver = IntegralSolver(read_problem(problem_id), None, problem_id, use_domains=use_domains)
+        solver.write_solutions = False
+        solver.full_solve()
+        assert not solver.controller.interrupted
+        best.append(solver.best_score)
+    assert best[0] == best[1]
@@ -0,0 +1,63 @@
+import random
+
+import pytest
+from shapely.geometry import LineString, Point, Polygon
+from shapely.prepared import prep
+
+from geometry import HoleIndex, HoleRaster
+from utils import read_problem
+
+
+# small and mid-sized holes, convex and not, with collinear runs of vertices
+PROBLEMS = [1, 11, 14, 19, 23, 52, 55, 66, 88]
+
+SHAPES = [
+    [(0, 0), (10, 0), (10, 10), (0, 10)],
+    [(0, 0), (7, 3), (2, 9)],
+    [(0, 0), (5, 0), (10, 0), (10, 5), (5, 5), (5, 10), (0, 10)],
+    [(0, 0), (12, 0), (12, 12), (6, 2), (0, 12)],
+]
+
+
+def shapely_mask(hole, raster):
+    polygon = prep(Polygon(hole))
+    return [[polygon.covers(Point(x, y)) for x in range(raster.xmin, raster.xmax + 1)]
+            for y in range(raster.ymin, raster.ymax + 1)]
+
+
+def get_hole(hole):
+    # a problem id or a list of vertices
+    return read_problem(hole)['hole'] if isinstance(hole, int) else hole
+
+
+@pytest.mark.parametrize('hole', SHAPES + PROBLEMS)
+def test_raster_matches_shapely(hole):
+    hole = get_hole(hole)
+    raster = HoleRaster(hole)
+    assert raster.mask.tolist() == shapely_mask(hole, raster)
+    for x, y in raster.points:
+        assert raster.contains(x, y)
+        assert tuple(raster.points[raster.point_index(x, y)]) == (x, y)
+    assert not raster.contains(raster.xmin - 1, raster.ymin)
+    assert raster.point_index(raster.xmax + 1, raster.ymax) == -1
+
+
+@pytest.mark.parametrize('hole', SHAPES + PROBLEMS)
+def test_segment_inside_matches_shapely(hole):
+    hole = get_hole(hole)
+    index = HoleIndex(hole)
+    polygon = prep(Polygon(hole))
+    raster = index.raster
+    rng = random.Random(0)
+    # inside points, hole vertices (edges along the boundary and through
+    # its corners) and points around the bounding box
+    points = [tuple(int(v) for v in p) for p in raster.points]
+    points = rng.sample(points, min(len(points), 200)) + [tuple(p) for p in hole]
+    points += [(rng.randint(raster.xmin - 2, raster.xmax + 2), rng.randint(raster.ymin - 2, raster.ymax + 2))
+               for _ in range(50)]
+    for _ in range(2000):
+        A, B = rng.choice(points), rng.choice(points)
+        expected = polygon.covers(LineString([A, B]) if A != B else Point(A))
+        assert index.is_segment_inside(A, B) == expected, (A, B)
+    for A, B in zip(hole, hole[1:] + hole[:1]):
+        assert index.is_segment_inside(A, B)
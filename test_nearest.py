@@ -0,0 +1,57 @@
+import random
+
+import pytest
+
+from nearest import PointGrid
+
+
+def brute_nearest(points, pt):
+    return min(((px - pt[0]) ** 2 + (py - pt[1]) ** 2, idx) for idx, (px, py) in points.items())
+
+
+def brute_within(points, pt, dist2):
+    return sorted(idx for idx, (px, py) in points.items() if (px - pt[0]) ** 2 + (py - pt[1]) ** 2 <= dist2)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_grid_matches_brute_force(seed):
+    rng = random.Random(seed)
+    span = rng.choice([10, 100, 1000])
+
+    def random_point():
+        return (rng.randint(-span, span), rng.randint(-span, span))
+
+    # few distinct points at span 10, so that points share coordinates
+    points = {i: random_point() for i in range(rng.randint(1, 50))}
+    grid = PointGrid([points[i] for i in range(len(points))])
+    next_idx = len(points)
+    for _ in range(300):
+        op = rng.random()
+        if op < 0.3:
+            points[next_idx] = random_point()
+            grid.insert(points[next_idx], next_idx)
+            next_idx += 1
+        elif op < 0.5 and len(points) > 1:
+            idx = rng.choice(sorted(points))
+            del points[idx]
+            grid.remove(idx)
+        elif op < 0.7:
+            idx = rng.choice(sorted(points))
+            points[idx] = random_point()
+            grid.move(idx, points[idx])
+        assert len(grid) == len(points)
+        # queries reach out of the bounding box of the points as well
+        queries = [(rng.randint(-2 * span, 2 * span), rng.randint(-2 * span, 2 * span)) for _ in range(5)]
+        assert grid.nearest_many(queries) == [brute_nearest(points, q) for q in queries]
+        dist2 = rng.randint(0, span * span)
+        assert sorted(grid.within(queries[0], dist2)) == brute_within(points, queries[0], dist2)
+
+
+def test_empty_grid():
+    grid = PointGrid()
+    assert grid.nearest((0, 0)) is None
+    assert grid.within((0, 0), 100) == []
+    grid.insert((3, 4), 7)
+    assert grid.nearest((0, 0)) == (25, 7)
+    grid.remove(7)
+    assert grid.nearest((0, 0)) is None
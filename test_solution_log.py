@@ -0,0 +1,48 @@
+import os
+
+from solution_log import SolutionLog, best_path, log_path, read_best, read_bests, read_log
+
+
+BONUS = [{'bonus': 'GLOBALIST', 'problem': 5}]
+
+
+def write_log(root, entries):
+    log = SolutionLog(1, root=root)
+    for vertices, dislikes, bonuses in entries:
+        log.add(vertices, dislikes, 'test', bonuses)
+    log.close()
+    return log
+
+
+def test_recovers_from_truncated_line(tmp_path):
+    root = str(tmp_path)
+    write_log(root, [([(0, 0), (1, 1)], 10, None), ([(0, 0), (2, 2)], 8, None), ([(5, 5), (6, 6)], 5, BONUS)])
+    size = os.path.getsize(log_path(1, root))
+    # a writer killed in the middle of a line, with the best pointer never updated
+    with open(log_path(1, root), 'ab') as f:
+        f.write(b'{"dislikes":1,"vertices":[[3,3],[4')
+
+    log = SolutionLog(1, root=root)
+    assert os.path.getsize(log_path(1, root)) == size
+    assert log.best == 8
+    assert log.bests['GLOBALIST:5'][0] == 5
+    # the line cut short is not a duplicate of anything, a solution already there is
+    log.add([(3, 3), (4, 4)], 7, 'test')
+    log.add([(0, 0), (2, 2)], 8, 'test')
+    log.close()
+    assert log.written == 1 and log.duplicates == 1
+
+    assert [e['dislikes'] for e in read_log(1, root)] == [10, 8, 5, 7]
+    assert read_best(1, root)['vertices'] == [[3, 3], [4, 4]]
+    assert read_bests(1, root)['GLOBALIST:5']['bonuses'] == BONUS
+
+
+def test_best_pointer_rebuilt_from_log(tmp_path):
+    root = str(tmp_path)
+    write_log(root, [([(0, 0), (1, 1)], 10, None), ([(5, 5), (6, 6)], 5, BONUS)])
+    with open(best_path(1, root), 'wt') as f:
+        f.write('{"dislikes": 10, "offset": 0}')
+    assert read_bests(1, root) == {}
+    SolutionLog(1, root=root).close()
+    assert read_best(1, root)['dislikes'] == 10
+    assert read_bests(1, root)['GLOBALIST:5']['dislikes'] == 5
@@ -0,0 +1,28 @@
+import pytest
+
+from solve import IntegralSolver
+from utils import read_problem
+
+
+class UnboundedSolver(IntegralSolver):
+    # the same search without branch and bound
+    def lower_bound(self, best=None):
+        return 0
+
+
+def solve_to_the_end(cls, problem_id, use_domains):
+    solver = cls(read_problem(problem_id), None, problem_id, use_domains=use_domains)
+    solver.write_solutions = False
+    solver.full_solve()
+    assert not solver.controller.interrupted
+    return solver
+
+
+@pytest.mark.parametrize('use_domains', [True, False])
+@pytest.mark.parametrize('problem_id', [14, 19, 27, 28, 29])
+def test_bound_keeps_the_optimum(problem_id, use_domains):
+    bounded = solve_to_the_end(IntegralSolver, problem_id, use_domains)
+    unbounded = solve_to_the_end(UnboundedSolver, problem_id, use_domains)
+    assert bounded.best_score == unbounded.best_score
+    assert bounded.search_nodes <= unbounded.search_nodes
+    assert unbounded.pruned == 0
@@ -1,4 +1,5 @@
 import json
+import math
 from pydash import _
 import os, os.path
 from collections import defaultdict
@@ -26,6 +27,13 @@ def read_json(file_name):
 def read_problem(problem_id, root='.'):
     return read_json(f'{root}/problems/{problem_id}')
 
+def problem_multiplier(spec):
+    # max score of a problem, reached with as few dislikes as the best team
+    return 1000 * math.log2(len(spec['figure']['vertices']) * len(spec['figure']['edges']) * len(spec['hole']) / 6.0)
+
+def problem_score(spec, dislikes, min_dislikes):
+    return problem_multiplier(spec) * math.sqrt((min_dislikes + 1) / (dislikes + 1))
+
 def bonus_graph():
     num_problems = len([name for name in os.listdir('problems')])
     res = defaultdict(dict)
@@ -1,43 +1,19 @@
 
 import sys
-import copy
-from collections import defaultdict, deque
+from collections import defaultdict
 import json
 
 from utils import read_problem
-from solve import compute_inside_points, is_edge_inside
+from edge_match import check_distance, dist2, edge_length_index
+from solve import is_edge_inside
 
 problem_id = sys.argv[1]
 spec = read_problem(problem_id)
 
 
-def check_distance(spec, orig_dist, new_dist):
-    if abs(1.0 * new_dist / orig_dist - 1) <= spec['epsilon'] / 10**6:
-        return True
-    return False
-
-
-def dist2(pt1, pt2):
-    x1, y1 = pt1
-    x2, y2 = pt2
-    return (x1 - x2) ** 2 + (y1 - y2) ** 2
-
 # for i in range(len(hole)):
 #     print (i, (i + 1) % len(hole), dist2(hole[i], hole[(i + 1) % len(hole)]))
 
-def find_all_pairs(spec, new_dist):
-    v = spec['figure']['vertices']
-    res = defaultdict(list)
-    ls = []
-    for (a, b) in sorted(spec['figure']['edges']):
-        orig_dist = dist2(v[a], v[b])
-        if check_distance(spec, orig_dist, new_dist):
-            res[a].append(b)
-            res[b].append(a)
-            ls.append((a, b))
-    return (res, ls)
-
-
 class WalkerSolver:
     def __init__(self, spec, problem_id):
         self.problem_id = problem_id
@@ -74,7 +50,7 @@ class WalkerSolver:
             b = self.next(a)
             d = dist2(hole[a], hole[b])
             # print (i, (i + 1) % len(hole), d)
-            res, ls = find_all_pairs(self.spec, d)
+            res, ls = edge_length_index(self.spec).matching_adjacency(d)
             # print ('hole from', a, 'to', b, '->', ls)
             self.possible[(a, b)] = res
 
@@ -106,20 +82,30 @@ class WalkerSolver:
     def find_biggest_mapping(self, existing_solution):
         best_solution = {}
         hole = self.spec['hole']
+        used_mask = 0
+        for v_idx in existing_solution.values():
+            used_mask |= 1 << v_idx
         for a in range(len(hole)):
             if a in existing_solution:
                 continue
+            # the walk can't go past the next mapped hole vertex
+            room = 1
+            while room < len(hole) and (a + room) % len(hole) not in existing_solution:
+                room += 1
+            if room <= max(6, len(best_solution)):
+                continue
+            seen = set()
             next_edge = (a, self.next(a))
             for v_idx in self.possible[next_edge].keys():
-                if v_idx in existing_solution.values():
+                if used_mask >> v_idx & 1:
                     continue
-                solution = self.run_bfs_from_mapping(existing_solution, a, v_idx)
+                solution = self.run_bfs_from_mapping(existing_solution, a, v_idx, used_mask, seen)
                 if len(solution) > 6:
                     # print ('a = {} to {} -> {}'.format(
                     #     a, v_idx, len(solution)
                     # ))
                     if len(solution) > len(best_solution):
-                        best_solution = copy.copy(solution)
+                        best_solution = solution
         return best_solution
 
     def check_partial_solution(self, solution, new_vertex, new_coords):
@@ -221,48 +207,53 @@ class WalkerSolver:
 
 
 
-    def run_bfs_from_mapping(self, existing_solution, hole_idx, v_idx):
-        # mapping from hole idx to figure idx
-        solution = {}
-        solution[hole_idx] = v_idx
-        a = hole_idx
-        # solution[15] = 34
-        # a = 15
-
-        count = 0
-    
-        best_solution = solution
-
-        q = deque()
-        q.append((a, solution))
-        while q:
-            (a, solution) = q.popleft()
-            # print ('count = {}, a = {}, solution = {}'.format(
-            #     count, a, solution
-            # ))
-            if len(best_solution) < len(solution):
-                best_solution = copy.copy(solution)
+    def run_bfs_from_mapping(self, existing_solution, hole_idx, v_idx, used_mask=None, seen=None):
+        # Longest walk along the hole from hole_idx (mapped to v_idx) matching
+        # every hole edge with a figure edge of the same length, as a mapping
+        # from hole idx to figure idx. Goes layer by layer (one hole edge per
+        # layer); a state is the figure vertex at the end and the bitmask of
+        # figure vertices used, paths are shared (vertex, parent) pairs.
+        # `seen` holds the (hole idx, figure vertex, mask) states already
+        # expanded from this hole_idx: a walk reaching one again can't get longer.
+        if used_mask is None:
+            used_mask = 0
+            for v in existing_solution.values():
+                used_mask |= 1 << v
+        if seen is None:
+            seen = set()
 
+        hole = self.spec['hole']
+        frontier = {(v_idx, 1 << v_idx): (v_idx, None)}
+        best_path = (v_idx, None)
+        a = hole_idx
+        for _ in range(len(hole) - 1):
             b = self.next(a)
-            v_a = solution[a]
-            for v_b in self.possible[(a, b)].get(v_a, []):
-                if v_b in existing_solution.values():
-                    continue
-                # print ('   a = {} v_a = {} checking v_b = {}'.format(
-                #     a, v_a, v_b
-                # ))
-                if v_b not in solution.values():
-                    next_solution = copy.copy(solution)
-                    next_solution[b] = v_b
-                    q.append((b, next_solution))
-            count += 1
-
-        # print ('best solution = {}'.format(best_solution))
-        return best_solution
-        # vertices_dict = {}
-        # for (hole_idx, v_idx) in best_solution.items():
-        #     vertices_dict[v_idx] = self.spec['hole'][hole_idx]
-        # self.dump_solution(vertices_dict)
+            if b in existing_solution:
+                break
+            possible = self.possible[(a, b)]
+            next_frontier = {}
+            for (v_a, mask), path in frontier.items():
+                for v_b in possible.get(v_a, []):
+                    bit = 1 << v_b
+                    if (mask | used_mask) & bit:
+                        continue
+                    state = (v_b, mask | bit)
+                    if state in next_frontier or (b, ) + state in seen:
+                        continue
+                    seen.add((b, ) + state)
+                    next_frontier[state] = (v_b, path)
+            if not next_frontier:
+                break
+            frontier = next_frontier
+            best_path = next(iter(frontier.values()))
+            a = b
+
+        path = []
+        while best_path is not None:
+            v, best_path = best_path
+            path.append(v)
+        path.reverse()
+        return {(hole_idx + i) % len(hole): v for i, v in enumerate(path)}
 
 
 solver = WalkerSolver(spec, problem_id)
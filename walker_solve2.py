@@ -1,39 +1,73 @@
 
 import sys
-import copy
+import random
+from array import array
 from collections import defaultdict, deque
 import json
 
 from utils import read_problem
-from solve import check_partial_solution, compute_inside_points, is_edge_inside
+from edge_match import check_distance, dist2, edge_length_index
 
 problem_id = sys.argv[1]
 spec = read_problem(problem_id)
 
 
-def check_distance(spec, orig_dist, new_dist):
-    if abs(1.0 * new_dist / orig_dist - 1) <= spec['epsilon'] / 10**6:
+
+# memory for the table of visited states, and how many maximal mappings to keep per length
+VISITED_MB = 256
+TOP_K = 100
+
+
+class VisitedTable:
+    # Fixed-capacity set of 64-bit state hashes. A hash may sit in one of two
+    # slots; when both are taken the one with the shorter mapping is replaced,
+    # as it is the cheapest to reach again. A forgotten state only means some
+    # work is repeated.
+    def __init__(self, capacity_bytes):
+        size = 2
+        while size * 2 * 10 <= capacity_bytes:
+            size *= 2
+        self.keys = array('Q', bytes(8 * size))
+        self.lengths = array('H', bytes(2 * size))
+        self.mask = size - 1
+        self.replaced = 0
+
+    def add(self, h, length):
+        # False if h is already in the table
+        h = h or 1  # 0 marks an empty slot
+        keys = self.keys
+        i = h & self.mask
+        j = i ^ 1
+        if keys[i] == h or keys[j] == h:
+            return False
+        if keys[i] == 0:
+            slot = i
+        elif keys[j] == 0:
+            slot = j
+        else:
+            slot = i if self.lengths[i] <= self.lengths[j] else j
+            self.replaced += 1
+        keys[slot] = h
+        self.lengths[slot] = min(length, 65535)
         return True
-    return False
 
 
-def dist2(pt1, pt2):
-    x1, y1 = pt1
-    x2, y2 = pt2
-    return (x1 - x2) ** 2 + (y1 - y2) ** 2
+class TopMappings:
+    # Up to k distinct mappings per length, first found first kept.
+    def __init__(self, k=TOP_K):
+        self.k = k
+        self.by_length = defaultdict(dict)
 
+    def add(self, length, h, make_mapping):
+        found = self.by_length[length]
+        if len(found) < self.k and h not in found:
+            found[h] = make_mapping()
 
-def find_all_pairs(spec, new_dist):
-    v = spec['figure']['vertices']
-    res = defaultdict(list)
-    ls = []
-    for (a, b) in sorted(spec['figure']['edges']):
-        orig_dist = dist2(v[a], v[b])
-        if check_distance(spec, orig_dist, new_dist):
-            res[a].append(b)
-            res[b].append(a)
-            ls.append((a, b))
-    return (res, ls)
+    def longest(self):
+        if not self.by_length:
+            return 0, []
+        length = max(self.by_length)
+        return length, list(self.by_length[length].values())
 
 
 class WalkerSolver2:
@@ -47,6 +81,19 @@ class WalkerSolver2:
         for (a, b) in sorted(self.spec['figure']['edges']):
             self.adj[a].append(b)
             self.adj[b].append(a)
+        self.adj_mask = defaultdict(int)
+        for a, neibs in self.adj.items():
+            for b in neibs:
+                self.adj_mask[a] |= 1 << b
+
+        # 64-bit Zobrist keys for (hole idx, figure idx) assignments, and for
+        # the one the walk goes on from: the same mapping grown up to one end
+        # of its hole run or the other has other extensions, so the visited
+        # states tell them apart
+        rng = random.Random(0)
+        num_vertices = len(self.spec['figure']['vertices'])
+        self.zobrist = [[rng.getrandbits(64) for _ in range(num_vertices)] for _ in self.spec['hole']]
+        self.end_zobrist = [[rng.getrandbits(64) for _ in range(num_vertices)] for _ in self.spec['hole']]
         
     def prev(self, b):
         a = b - 1
@@ -85,7 +132,7 @@ class WalkerSolver2:
             b = self.next(a)
             d = dist2(hole[a], hole[b])
             # print (i, (i + 1) % len(hole), d)
-            res, ls = find_all_pairs(self.spec, d)
+            res, ls = edge_length_index(self.spec).matching_adjacency(d)
             # print ('hole from', a, 'to', b, '->', ls)
             self.possible[(a, b)] = res
             self.possible[(b, a)] = res
@@ -106,23 +153,28 @@ class WalkerSolver2:
 
     def run_through_all(self, solution):
         hole = self.spec['hole']
-        dist = defaultdict(set)
+        dist = TopMappings()
+        # every seed extends the same solution, so they can share the visited
+        # states: a state is the mapping and the end it is walked from, what
+        # follows does not depend on the seed it grew from
+        visited = VisitedTable(VISITED_MB * 2**20)
         for hole_idx in range(len(hole)):
             for v_idx in self.adj:   
                 if hole_idx in solution or v_idx in solution.values():
                     continue          
-                self.run_bfs_from_mapping(solution, hole_idx, v_idx, dist)
+                self.run_bfs_from_mapping(solution, hole_idx, v_idx, dist, visited)
 
-        max_dist = max(dist.keys())
-        count = len(dist[max_dist])
-        print ('{} solutions of max length {}:'.format(count, max_dist))
-        for s in dist[max_dist]:
+        max_dist, found = dist.longest()
+        count = len(found)
+        print ('{} solutions of max length {} (top {} kept, {} visited states replaced):'.format(
+            count, max_dist, dist.k, visited.replaced))
+        for s in found:
             print (' >> {}'.format(s))
-        return list(dist[max_dist])[0]
+        return found[0]
 
     def run_bfs(self):
         solution = {}
-        dist = defaultdict(set)
+        dist = TopMappings()
 
         solution = self.run_bfs_from_mapping(solution, 40, 88, dist)
         vertices_dict = {}
@@ -146,41 +198,76 @@ class WalkerSolver2:
 
 
 
-    def run_bfs_from_mapping(self, solution, hole_idx, v_idx, dist):
-        solution = copy.copy(solution)
-        # mapping from hole idx to figure idx
-        solution[hole_idx] = v_idx
-        start = hole_idx
-
-        visited = set()
-        
-        best_solution = solution
+    def is_consistent(self, fig_pos, path, hole_idx, v_idx):
+        # check only the figure edges from v_idx to vertices already mapped
+        hole = self.spec['hole']
+        vertices = self.spec['figure']['vertices']
+        for u in self.adj[v_idx]:
+            u_hole = fig_pos.get(u)
+            if u_hole is None:
+                node = path
+                while node is not None:
+                    (h, v), node = node
+                    if v == u:
+                        u_hole = h
+                        break
+            if u_hole is None:
+                continue
+            if not check_distance(self.spec, dist2(vertices[u], vertices[v_idx]), dist2(hole[u_hole], hole[hole_idx])):
+                return False
+        return True
 
+    def run_bfs_from_mapping(self, solution, hole_idx, v_idx, dist, visited=None):
+        # States are (hole idx, figure idx, zobrist hash, hole mask, figure mask,
+        # length, path) with path a shared chain of ((hole idx, figure idx), parent)
+        # for the assignments added to `solution`. `dist` gets the mappings that
+        # can't be extended, the longest one is returned.
+        base = dict(solution)
+        base[hole_idx] = v_idx
+        fig_pos = {v: h for h, v in base.items()}
+        h0 = hole_mask = fig_mask = 0
+        for h, v in base.items():
+            h0 ^= self.zobrist[h][v]
+            hole_mask |= 1 << h
+            fig_mask |= 1 << v
+
+        if visited is None:
+            visited = VisitedTable(VISITED_MB * 2**20)
+        visited.add(h0 ^ self.end_zobrist[hole_idx][v_idx], len(base))
+
+        def mapping(path):
+            res = dict(base)
+            while path is not None:
+                (h, v), path = path
+                res[h] = v
+            return tuple(sorted(res.items()))
+
+        best_len, best_path = len(base), None
         q = deque()
-        q.append((start, solution))        
+        q.append((hole_idx, v_idx, h0, hole_mask, fig_mask, len(base), None))
         while q:
-            (now, solution) = q.popleft()
-            v_now = solution[now]
-            edges = [(now, self.next(now)), (now, self.prev(now))]
-            for (a, b) in edges:
-                for v_next in self.possible[(a, b)].get(v_now, []):
-                    if b in solution or v_next in solution.values():
+            (now, v_now, h, hole_mask, fig_mask, length, path) = q.popleft()
+            if length > best_len:
+                best_len, best_path = length, path
+            extended = False
+            for b in (self.next(now), self.prev(now)):
+                if hole_mask >> b & 1:
+                    continue
+                for v_next in self.possible[(now, b)].get(v_now, []):
+                    if fig_mask >> v_next & 1:
                         continue
-                    next = b
-                    next_solution = copy.copy(solution)
-                    next_solution[b] = v_next
-                    key = tuple(sorted(next_solution.items()))
-                    if key in visited:
+                    if fig_mask & self.adj_mask[v_next] and not self.is_consistent(fig_pos, path, b, v_next):
                         continue
-                    if not self.check_partial_solution(solution):
+                    extended = True
+                    next_h = h ^ self.zobrist[b][v_next]
+                    if not visited.add(next_h ^ self.end_zobrist[b][v_next], length + 1):
                         continue
-                    visited.add(key)
-                    q.append((next, next_solution))
-                    dist[len(next_solution)].add(key)
-                    if len(best_solution) < len(solution):
-                        best_solution = solution
+                    q.append((b, v_next, next_h, hole_mask | 1 << b, fig_mask | 1 << v_next,
+                              length + 1, ((b, v_next), path)))
+            if not extended:
+                dist.add(length, h, lambda: mapping(path))
 
-        return best_solution
+        return dict(mapping(best_path))
 
 
 